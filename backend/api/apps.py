@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.DB_CONN_HEALTH_CHECKS:
+            from .db import defer_health_checks
+            request_started.connect(defer_health_checks)
+        if settings.SQL_PROFILING:
+            from .middleware import install_profiler
+            connection_created.connect(install_profiler)
@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .db import defer_health_checks
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+read_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_READ_THREADS, thread_name_prefix='read-view'
+)
+
+
+def run_read_view(view, request, *args, **kwargs):
+    close_old_connections()
+    if settings.DB_CONN_HEALTH_CHECKS:
+        defer_health_checks(sender=None)
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(viewset, actions, **initkwargs):
+    view = viewset.as_view(actions, **initkwargs)
+    read = sync_to_async(
+        run_read_view, thread_sensitive=False, executor=read_executor
+    )
+    write = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await read(view, request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    return async_view
@@ -0,0 +1,116 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.user_keys = defaultdict(set)
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared_cache(self):
+        if settings.TOKEN_CACHE:
+            return caches[settings.TOKEN_CACHE]
+        return None
+
+    @staticmethod
+    def version_key(user_id):
+        return f'tokens:user:{user_id}:version'
+
+    def get_version(self, user_id):
+        if self.shared_cache is None:
+            return None
+        return self.shared_cache.get(self.version_key(user_id))
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            keys = self.user_keys[entry[0].user_id]
+            keys.discard(key)
+            if not keys:
+                del self.user_keys[entry[0].user_id]
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() < entry[1]:
+                self.entries.move_to_end(key)
+            else:
+                self.discard(key)
+                entry = None
+        if (
+            entry is not None
+            and entry[2] != self.get_version(entry[0].user_id)
+        ):
+            with self.lock:
+                self.discard(key)
+            entry = None
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, token, generation, version):
+        expires_at = time.monotonic() + settings.TOKEN_CACHE_TTL
+        with self.lock:
+            if self.generation != generation:
+                return
+            self.discard(key)
+            self.entries[key] = (token, expires_at, version)
+            self.user_keys[token.user_id].add(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.discard(next(iter(self.entries)))
+
+    def remove_user(self, user_id):
+        with self.lock:
+            self.generation += 1
+            for key in self.user_keys.pop(user_id, ()):
+                del self.entries[key]
+        if self.shared_cache is not None:
+            self.shared_cache.set(
+                self.version_key(user_id), uuid.uuid4().hex, None
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'hit_rate': round(self.hits / total, 3) if total else None,
+        }
+
+
+token_cache = TokenCache()
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        if settings.TOKEN_CACHE_SIZE <= 0:
+            return super().authenticate_credentials(key)
+        cached = token_cache.get(key)
+        if cached is None:
+            generation = token_cache.generation
+            _, cached = super().authenticate_credentials(key)
+            token_cache.set(
+                key, cached, generation,
+                token_cache.get_version(cached.user_id)
+            )
+        token = copy.copy(cached)
+        token.user = copy.copy(cached.user)
+        return token.user, token
@@ -0,0 +1,80 @@
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class ResponseCache:
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def cache(self):
+        if settings.RECIPE_CACHE:
+            return caches[settings.RECIPE_CACHE]
+        return None
+
+    def version_key(self, scope):
+        return f'{self.name}:version:{scope}'
+
+    def get_versions(self, *scopes):
+        keys = [self.version_key(scope) for scope in scopes]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                version = uuid.uuid4().hex
+                if not self.cache.add(key, version, None):
+                    version = self.cache.get(key, version)
+                versions[key] = version
+        return [versions[key] for key in keys]
+
+    def invalidate(self, *scopes):
+        if self.cache is not None:
+            self.cache.set_many({
+                self.version_key(scope): uuid.uuid4().hex for scope in scopes
+            }, None)
+
+    def get_key(self, request, *scopes):
+        params = urlencode(sorted(
+            (name, value)
+            for name in request.query_params
+            for value in request.query_params.getlist(name)
+        ))
+        digest = hashlib.sha1('|'.join([
+            request.build_absolute_uri(request.path),
+            params,
+            request.accepted_media_type,
+            *self.get_versions(*scopes),
+        ]).encode()).hexdigest()
+        return f'{self.name}:response:{digest}'
+
+    def get_body_keys(self, request, recipe_ids):
+        root = request.build_absolute_uri('/') if request else ''
+        catalog, *versions = self.get_versions(
+            'catalog', *[f'recipe:{pk}' for pk in recipe_ids]
+        )
+        return {
+            pk: '{}:body:{}'.format(self.name, hashlib.sha1('|'.join([
+                root, str(pk), catalog, version
+            ]).encode()).hexdigest())
+            for pk, version in zip(recipe_ids, versions)
+        }
+
+    def get_bodies(self, keys):
+        cached = self.cache.get_many(list(keys.values()))
+        return {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+    def set_bodies(self, bodies):
+        self.cache.set_many(bodies, settings.RECIPE_CACHE_TTL)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, response):
+        self.cache.set(key, response, settings.RECIPE_CACHE_TTL)
+
+
+recipe_cache = ResponseCache('recipes')
@@ -0,0 +1,99 @@
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import Ingredient, Tag
+from .serializers import IngredientSerializer, TagSerializer
+
+TAG_IDS_KEY = 'catalog:tags:ids'
+
+
+class CatalogCache:
+
+    def __init__(self, name, get_queryset, serializer_class):
+        self.name = name
+        self.get_queryset = get_queryset
+        self.serializer_class = serializer_class
+        self.entry = None
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    @property
+    def shared_cache(self):
+        if settings.CATALOG_CACHE:
+            return caches[settings.CATALOG_CACHE]
+        return None
+
+    @property
+    def version_key(self):
+        return f'catalog:{self.name}:version'
+
+    def render(self, version):
+        body = JSONRenderer().render(
+            self.serializer_class(self.get_queryset(), many=True).data
+        )
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        return version, etag, body, time.monotonic()
+
+    def get_shared_version(self):
+        version = self.shared_cache.get(self.version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not self.shared_cache.add(self.version_key, version, None):
+                version = self.shared_cache.get(self.version_key, version)
+        return version
+
+    def get_shared_entry(self, version):
+        key = f'catalog:{self.name}:{version}'
+        cached = self.shared_cache.get(key)
+        if cached is not None:
+            return (version, *cached, time.monotonic())
+        entry = self.render(version)
+        self.shared_cache.set(key, entry[1:3], settings.CATALOG_CACHE_TTL)
+        return entry
+
+    def get(self):
+        generation, entry = self.generation, self.entry
+        if self.shared_cache is not None:
+            version = self.get_shared_version()
+            if entry is None or entry[0] != version:
+                entry = self.get_shared_entry(version)
+        elif (
+            entry is None
+            or time.monotonic() - entry[3] > settings.CATALOG_CACHE_TTL
+        ):
+            entry = self.render(None)
+        with self.lock:
+            if self.generation == generation:
+                self.entry = entry
+        return entry[1], entry[2]
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.entry = None
+        if self.shared_cache is not None:
+            self.shared_cache.set(self.version_key, uuid.uuid4().hex, None)
+
+
+def get_tag_ids():
+    tag_ids = cache.get(TAG_IDS_KEY)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_IDS_KEY, tag_ids, settings.CATALOG_CACHE_TTL)
+    return tag_ids
+
+
+def invalidate_tag_ids():
+    cache.delete(TAG_IDS_KEY)
+
+
+tag_catalog = CatalogCache('tags', Tag.objects.all, TagSerializer)
+ingredient_catalog = CatalogCache(
+    'ingredients', Ingredient.objects.all, IngredientSerializer
+)
@@ -0,0 +1,22 @@
+from django.db import connections
+
+
+def check_on_first_use(connection):
+    ensure_connection = type(connection).ensure_connection
+
+    def ensure_usable_connection():
+        del connection.ensure_connection
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+        ensure_connection(connection)
+
+    connection.ensure_connection = ensure_usable_connection
+
+
+def defer_health_checks(sender, **kwargs):
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and 'ensure_connection' not in vars(connection)
+        ):
+            check_on_first_use(connection)
@@ -1,32 +1,45 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Recipe, Tag, User
+from recipes.models import Recipe, User
+from recipes.search import search_recipes
+from .catalog import get_tag_ids
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class RecipeFilter(filters.FilterSet):
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices, method='filter_tags'
     )
     is_favorited = filters.BooleanFilter(method='filter_favorited')
     is_in_shopping_cart = filters.BooleanFilter(method='filter_shopping')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = (
-            'author', 'is_favorited', 'tags', 'is_in_shopping_cart',
+            'author', 'is_favorited', 'tags', 'is_in_shopping_cart', 'search',
         )
 
+    def filter_tags(self, recipes, name, slugs):
+        tag_ids = get_tag_ids()
+        return recipes.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag_id__in=[tag_ids[slug] for slug in slugs if slug in tag_ids]
+        )))
+
     def filter_favorited(self, recipes, name, value):
         if self.request is None:
             return Recipe.objects.none()
         if not self.request.user.is_authenticated:
             return recipes
         if not value:
-            return recipes.exclude(favorited_by=self.request.user)
-        return recipes.filter(favorited_by=self.request.user)
+            return recipes.exclude(favorites__user=self.request.user)
+        return recipes.filter(favorites__user=self.request.user)
 
     def filter_shopping(self, recipes, name, value):
         if self.request is None:
@@ -34,5 +47,8 @@ class RecipeFilter(filters.FilterSet):
         if not self.request.user.is_authenticated:
             return recipes
         if not value:
-            return recipes.exclude(shopped_by=self.request.user)
-        return recipes.filter(shopped_by=self.request.user)
+            return recipes.exclude(shopping_cart_items__user=self.request.user)
+        return recipes.filter(shopping_cart_items__user=self.request.user)
+
+    def filter_search(self, recipes, name, value):
+        return search_recipes(recipes, value)
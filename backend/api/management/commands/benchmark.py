@@ -0,0 +1,235 @@
+import json
+import math
+import subprocess
+import time
+from datetime import datetime, timezone
+from itertools import combinations
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment
+)
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCartItem,
+    Subscription,
+    Tag,
+    User
+)
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and query counts of the main API endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument(
+            '--compare', help='Previous results to compare p95 with'
+        )
+        parser.add_argument(
+            '--user', help='Username of the authenticated client'
+        )
+
+    def get_user(self, username):
+        users = User.objects.order_by('-subscribed_to_count', 'pk')
+        if username:
+            users = users.filter(username=username)
+        user = users.first()
+        if user is None:
+            raise CommandError('No users found, run generate_data first.')
+        return user
+
+    def get_scenarios(self, user):
+        recipe = Recipe.objects.filter(
+            favorites__user=user
+        ).select_related('author').first() or Recipe.objects.first()
+        if recipe is None:
+            raise CommandError('No recipes found, run generate_data first.')
+        author = recipe.author
+        slugs = list(recipe.tags.values_list('slug', flat=True)[:2])
+        word = recipe.name.split()[0].strip(',')
+        filters = {
+            'author': [('author', author.pk)],
+            'tags': [('tags', slug) for slug in slugs],
+            'is_favorited': [('is_favorited', 1)],
+            'is_in_shopping_cart': [('is_in_shopping_cart', 1)],
+            'search': [('search', word)],
+        }
+        scenarios = [('tags', False, '/api/tags/')]
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                params = [
+                    param for name in names for param in filters[name]
+                ]
+                scenarios.append((
+                    'recipes ' + (' + '.join(names) or 'all'),
+                    True,
+                    f'/api/recipes/?{urlencode(params)}'.rstrip('?')
+                ))
+        scenarios.append(
+            ('recipe detail', True, f'/api/recipes/{recipe.pk}/')
+        )
+        popular = Recipe.objects.exclude(
+            favorites__user=user
+        ).order_by('-favorites_count').first()
+        if popular is not None:
+            scenarios.append((
+                'favorite toggle',
+                True,
+                f'/api/recipes/{popular.pk}/favorite/',
+                'post',
+                'delete'
+            ))
+        for prefix in {word[:1], word[:3], word}:
+            scenarios.append((
+                f'ingredients search "{prefix}"',
+                False,
+                '/api/ingredients/?' + urlencode({'name': prefix})
+            ))
+        scenarios += [
+            ('recipes feed', True, '/api/recipes/feed/'),
+            (
+                'subscriptions',
+                True,
+                '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            (
+                'download shopping cart txt',
+                True,
+                '/api/recipes/download_shopping_cart/'
+            ),
+            (
+                'download shopping cart csv',
+                True,
+                '/api/recipes/download_shopping_cart/?format=csv'
+            ),
+            (
+                'download shopping cart pdf',
+                True,
+                '/api/recipes/download_shopping_cart/?format=pdf'
+            ),
+        ]
+        return scenarios
+
+    @staticmethod
+    def request(client, path, methods):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for method in methods:
+                response = getattr(client, method)(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            duration = time.perf_counter() - started
+        return response.status_code, duration, len(queries)
+
+    def run_scenario(self, client, path, methods, iterations, warmup):
+        for _ in range(warmup):
+            self.request(client, path, methods)
+        durations, query_counts, statuses = [], set(), set()
+        for _ in range(iterations):
+            status, duration, queries = self.request(client, path, methods)
+            durations.append(duration * 1000)
+            query_counts.add(queries)
+            statuses.add(status)
+        durations.sort()
+        return {
+            'status': sorted(statuses),
+            'queries': max(query_counts),
+            'mean_ms': round(sum(durations) / len(durations), 2),
+            **{
+                f'p{percent}_ms': round(percentile(durations, percent), 2)
+                for percent in PERCENTILES
+            },
+        }
+
+    def load_baseline(self, filename):
+        if not filename:
+            return {}
+        with open(filename, encoding='utf-8') as file:
+            return {
+                result['name']: result for result in json.load(file)['results']
+            }
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive.')
+        baseline = self.load_baseline(options['compare'])
+        user = self.get_user(options['user'])
+        anonymous, authenticated = APIClient(), APIClient()
+        authenticated.force_authenticate(user)
+        results = []
+        setup_test_environment()
+        try:
+            for name, auth, path, *methods in self.get_scenarios(user):
+                result = {
+                    'name': name,
+                    'path': path,
+                    'authenticated': auth,
+                    **self.run_scenario(
+                        authenticated if auth else anonymous,
+                        path,
+                        methods or ['get'],
+                        options['iterations'],
+                        options['warmup']
+                    )
+                }
+                results.append(result)
+                line = (
+                    f'{name:<70} {result["queries"]:>3} queries  '
+                    f'p50 {result["p50_ms"]:>8.2f}  '
+                    f'p95 {result["p95_ms"]:>8.2f}  '
+                    f'p99 {result["p99_ms"]:>8.2f} ms'
+                )
+                if baseline.get(name, {}).get('p95_ms'):
+                    before = baseline[name]['p95_ms']
+                    change = (result['p95_ms'] - before) / before * 100
+                    line += f'  p95 {change:+.0f}%'
+                self.stdout.write(line)
+        finally:
+            teardown_test_environment()
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'commit': get_commit(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'user': user.username,
+            'dataset': {
+                model._meta.model_name: model.objects.count()
+                for model in (
+                    User, Recipe, Ingredient, Tag, Subscription,
+                    Favorite, ShoppingCartItem
+                )
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Results saved to {options["output"]}'
+        ))
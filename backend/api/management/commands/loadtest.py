@@ -0,0 +1,118 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark import PERCENTILES, get_commit, percentile
+
+DEFAULT_PATHS = ('/api/tags/', '/api/ingredients/')
+
+
+class Command(BaseCommand):
+    help = 'Measure requests per second of a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=DEFAULT_PATHS,
+            help='Paths to request, tags and ingredients by default'
+        )
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--requests', type=int, default=2000, help='Requests per path'
+        )
+        parser.add_argument('--token', help='Authorization token')
+        parser.add_argument('--timeout', type=float, default=60)
+        parser.add_argument('--output', help='File to save results to')
+
+    def get_connection(self, url, timeout):
+        connection_class = (
+            http.client.HTTPSConnection if url.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        return connection_class(url.hostname, url.port, timeout=timeout)
+
+    def run_path(self, url, path, options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        durations, errors = [], []
+        lock = threading.Lock()
+        left = [options['requests']]
+
+        def worker():
+            connection = self.get_connection(url, options['timeout'])
+            while True:
+                with lock:
+                    if left[0] <= 0:
+                        break
+                    left[0] -= 1
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as error:
+                    connection.close()
+                    connection = self.get_connection(url, options['timeout'])
+                    with lock:
+                        errors.append(repr(error))
+                    continue
+                duration = time.perf_counter() - started
+                with lock:
+                    if response.status != 200:
+                        errors.append(response.status)
+                    durations.append(duration * 1000)
+            connection.close()
+
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(options['concurrency'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if not durations:
+            raise CommandError(f'No responses from {url.geturl()}{path}.')
+        durations.sort()
+        return {
+            'path': path,
+            'requests': len(durations),
+            'errors': len(errors),
+            'rps': round(len(durations) / elapsed, 1),
+            **{
+                f'p{percent}_ms': round(percentile(durations, percent), 2)
+                for percent in PERCENTILES
+            },
+        }
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError(
+                '--concurrency and --requests must be positive.'
+            )
+        url = urlsplit(options['url'])
+        results = []
+        for path in options['paths']:
+            result = self.run_path(url, path, options)
+            results.append(result)
+            self.stdout.write(
+                f'{path:<40} {result["rps"]:>8.1f} req/s  '
+                f'p50 {result["p50_ms"]:>8.2f}  '
+                f'p99 {result["p99_ms"]:>8.2f} ms  '
+                f'errors {result["errors"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'url': options['url'],
+                    'commit': get_commit(),
+                    'concurrency': options['concurrency'],
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,100 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .authentication import token_cache
+
+logger = logging.getLogger('api.sql')
+current_profile = ContextVar('current_profile', default=None)
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+
+
+def get_fingerprint(sql):
+    return PLACEHOLDER_LISTS.sub('(...)', LITERALS.sub('%s', sql))
+
+
+class QueryProfile:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[get_fingerprint(sql)] += 1
+
+
+def profile_queries(execute, sql, params, many, context):
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install_profiler(sender, connection, **kwargs):
+    if profile_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_queries)
+
+
+class SQLProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self.report(
+            request, response, profile, time.perf_counter() - started
+        )
+        return response
+
+    @staticmethod
+    def report(request, response, profile, duration):
+        db_ms = profile.duration * 1000
+        total_ms = duration * 1000
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{profile.count} queries", '
+            f'total;dur={total_ms:.1f}'
+        )
+        repeated = [
+            {'fingerprint': fingerprint, 'count': count}
+            for fingerprint, count in profile.fingerprints.most_common(5)
+            if count > 1
+        ]
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'queries': profile.count,
+            'db_ms': round(db_ms, 1),
+            'total_ms': round(total_ms, 1),
+            'repeated': repeated,
+            'token_cache': token_cache.stats(),
+        }
+        if (
+            repeated
+            and repeated[0]['count'] > settings.SQL_PROFILING_REPEAT_LIMIT
+        ):
+            data['n_plus_one'] = True
+            logger.warning(json.dumps(data, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(data, ensure_ascii=False))
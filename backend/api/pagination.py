@@ -1,5 +1,117 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.serializers import ValidationError
+
+CURSOR_NOT_ALLOWED = 'Курсорная пагинация недоступна с параметром {}.'
 
 
 class FoodgramPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+def reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+class FoodgramCursorPagination(CursorPagination):
+    """Keyset по всем полям сортировки вместо позиции и смещения."""
+
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def get_seek_filter(self, ordering, position):
+        seek, equal = Q(), {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            seek |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return seek
+
+    def decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor and self.cursor.position
+        ordering = (
+            reverse_ordering(self.ordering) if reverse else self.ordering
+        )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(
+                ordering, self.decode_position(position)
+            ))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        if reverse:
+            self.page.reverse()
+            self.next_position, self.previous_position = position, following
+        else:
+            self.next_position, self.previous_position = following, position
+        self.has_next = self.next_position is not None
+        self.has_previous = self.previous_position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            str(
+                instance[field.lstrip('-')] if isinstance(instance, dict)
+                else getattr(instance, field.lstrip('-'))
+            )
+            for field in ordering
+        ])
+
+
+class CursorPaginationMixin:
+    pagination_query_param = 'pagination'
+    cursor_pagination_class = FoodgramCursorPagination
+    cursor_ordering = None
+    cursor_excluded_params = ()
+
+    def use_cursor_pagination(self):
+        params = self.request.query_params
+        if not (
+            params.get(self.pagination_query_param) == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param in params
+        ):
+            return False
+        for param in self.cursor_excluded_params:
+            if param in params:
+                raise ValidationError(
+                    {param: CURSOR_NOT_ALLOWED.format(param)}
+                )
+        return True
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.use_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+            if self.cursor_ordering:
+                self._paginator.ordering = self.cursor_ordering
+        return super().paginator
@@ -0,0 +1,33 @@
+from rest_framework.renderers import BaseRenderer
+
+from .utils import (
+    stream_shopping_list_csv,
+    stream_shopping_list_pdf,
+    stream_shopping_list_txt
+)
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    stream = staticmethod(stream_shopping_list_txt)
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    stream = staticmethod(stream_shopping_list_csv)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    stream = staticmethod(stream_shopping_list_pdf)
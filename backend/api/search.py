@@ -0,0 +1,155 @@
+import heapq
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+from threading import Lock
+
+from django.conf import settings
+
+from recipes.models import Ingredient, RecipeProduct
+
+
+class IngredientIndex:
+    fields = ('id', 'name', 'measurement_unit')
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = Lock()
+        self.index = None
+
+    def invalidate(self):
+        self.index = None
+
+    def is_stale(self, index):
+        return index is None or time.monotonic() - index[2] > self.ttl
+
+    def build(self):
+        entries = sorted(
+            (name.lower(), id, dict(zip(self.fields, (id, name, unit))))
+            for id, name, unit in Ingredient.objects.values_list(*self.fields)
+        )
+        self.index = (
+            [key for key, _, _ in entries], entries, time.monotonic()
+        )
+        return self.index
+
+    def get_index(self):
+        index = self.index
+        if self.is_stale(index):
+            with self.lock:
+                index = self.index
+                if self.is_stale(index):
+                    index = self.build()
+        return index
+
+    def search(self, query, limit):
+        keys, entries, _ = self.get_index()
+        query = query.lower()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\uffff', start)
+        found = [row for _, _, row in entries[start:min(end, start + limit)]]
+        for index in chain(range(start), range(end, len(entries))):
+            if len(found) == limit:
+                break
+            key, _, row = entries[index]
+            if query in key:
+                found.append(row)
+        return found
+
+
+class RankedRecipes:
+
+    def __init__(self, matched, sizes):
+        self.scores = [
+            (count / sizes[recipe_id], count, recipe_id)
+            for recipe_id, count in matched.items()
+            if sizes.get(recipe_id)
+        ]
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, window):
+        if not isinstance(window, slice):
+            return self[window:window + 1][0]
+        start, stop, step = window.indices(len(self.scores))
+        return heapq.nlargest(stop, self.scores)[start:stop:step]
+
+
+class RecipeCoverageIndex:
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = Lock()
+        self.index = None
+
+    def invalidate(self):
+        self.index = None
+
+    def is_stale(self, index):
+        return index is None or time.monotonic() - index[2] > self.ttl
+
+    def build(self):
+        postings, sizes = {}, Counter()
+        for ingredient_id, recipe_id in RecipeProduct.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').iterator():
+            postings.setdefault(ingredient_id, array('q')).append(recipe_id)
+            sizes[recipe_id] += 1
+        self.index = (postings, sizes, time.monotonic())
+        return self.index
+
+    def get_index(self):
+        index = self.index
+        if self.is_stale(index):
+            with self.lock:
+                index = self.index
+                if self.is_stale(index):
+                    index = self.build()
+        return index[:2]
+
+    def change(self, recipe_id, ingredient_ids, delta):
+        with self.lock:
+            if self.index is None:
+                return
+            postings, sizes, built_at = self.index
+            postings, sizes = dict(postings), Counter(sizes)
+            for ingredient_id in ingredient_ids:
+                recipes = postings.get(ingredient_id, ())
+                position = bisect_left(recipes, recipe_id)
+                found = (
+                    position < len(recipes) and recipes[position] == recipe_id
+                )
+                if found == (delta > 0):
+                    continue
+                recipes = array('q', recipes)
+                if delta > 0:
+                    recipes.insert(position, recipe_id)
+                else:
+                    del recipes[position]
+                postings[ingredient_id] = recipes
+                sizes[recipe_id] += delta
+                if sizes[recipe_id] <= 0:
+                    del sizes[recipe_id]
+            self.index = (postings, sizes, built_at)
+
+    def add(self, recipe_id, ingredient_ids):
+        self.change(recipe_id, ingredient_ids, 1)
+
+    def remove(self, recipe_id, ingredient_ids):
+        self.change(recipe_id, ingredient_ids, -1)
+
+    def rank(self, ingredient_ids):
+        postings, sizes = self.get_index()
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        return RankedRecipes(matched, sizes)
+
+
+ingredient_index = IngredientIndex(ttl=settings.INGREDIENT_SEARCH_TTL)
+recipe_coverage_index = RecipeCoverageIndex(
+    ttl=settings.RECIPE_COVERAGE_TTL
+)
@@ -1,8 +1,28 @@
-from drf_extra_fields.fields import Base64ImageField
+from collections import Counter, OrderedDict
+
+import filetype
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
+from drf_extra_fields.fields import Base64FileField, Base64ImageField
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from recipes.constants import MIN_COOKING_TIME, MIN_INGREDIENT_AMOUNT
-from recipes.models import Ingredient, Recipe, RecipeProduct, Tag, User
+from recipes.counters import batched_counters, change_counter
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeProduct,
+    ShoppingCartItem,
+    Tag,
+    User
+)
+from recipes.search import update_search_index
+from .cache import recipe_cache
+from .search import recipe_coverage_index
+from .utils import get_recipes_limit
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,11 +36,16 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, user):
-        current_user = self.context['request'].user
-        return (
-            current_user.is_authenticated
-            and current_user.subscribed_to.filter(subscribing=user).exists()
-        )
+        request = self.context['request']
+        if not request.user.is_authenticated:
+            return False
+        if not hasattr(request, 'subscribed_ids'):
+            request.subscribed_ids = set(
+                request.user.subscribed_to.values_list(
+                    'subscribing_id', flat=True
+                )
+            )
+        return user.id in request.subscribed_ids
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -40,10 +65,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeProductSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient', read_only=False,
-        required=True, queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(source='ingredient_id')
     name = serializers.CharField(source='ingredient.name', read_only=True)
     measurement_unit = serializers.CharField(
         source='ingredient.measurement_unit', read_only=True
@@ -57,19 +79,66 @@ class RecipeProductSerializer(serializers.ModelSerializer):
         )
 
 
+class TagListField(serializers.ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        ids = []
+        for pk in data:
+            if isinstance(pk, bool):
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+            try:
+                ids.append(int(pk))
+            except (TypeError, ValueError):
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+        tags = child.get_queryset().in_bulk(ids)
+        for pk in ids:
+            if pk not in tags:
+                child.fail('does_not_exist', pk_value=pk)
+        return [tags[pk] for pk in ids]
+
+
 class TagField(serializers.PrimaryKeyRelatedField):
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        return TagListField(child_relation=cls(*args, **kwargs), **{
+            key: value for key, value in kwargs.items()
+            if key in MANY_RELATION_KWARGS
+        })
+
     def to_representation(self, tag):
         return TagSerializer(tag).data
 
 
+class Base64RawImageField(Base64FileField):
+    ALLOWED_TYPES = Base64ImageField.ALLOWED_TYPES
+    INVALID_FILE_MESSAGE = Base64ImageField.INVALID_FILE_MESSAGE
+    INVALID_TYPE_MESSAGE = Base64ImageField.INVALID_TYPE_MESSAGE
+
+    def get_file_extension(self, filename, decoded_file):
+        return filetype.guess_extension(decoded_file)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, models.Manager) else data
+        return self.child.represent(list(recipes))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     author = UserSerializer(read_only=True)
     tags = TagField(many=True, queryset=Tag.objects.all())
     ingredients = RecipeProductSerializer(source='recipe_products', many=True)
-    image = Base64ImageField()
+    image = Base64RawImageField()
+    image_srcset = serializers.SerializerMethodField(read_only=True)
     cooking_time = serializers.IntegerField(min_value=MIN_COOKING_TIME)
 
     class Meta:
@@ -77,19 +146,95 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time'
+            'name', 'image', 'image_srcset', 'text', 'cooking_time'
+        )
+        list_serializer_class = RecipeListSerializer
+
+    overlay_fields = ('is_favorited', 'is_in_shopping_cart')
+
+    def to_representation(self, recipe):
+        return self.represent([recipe])[0]
+
+    def represent(self, recipes):
+        keys, bodies = {}, {}
+        if recipe_cache.cache is not None and recipes:
+            keys = recipe_cache.get_body_keys(
+                self.context.get('request'),
+                [recipe.pk for recipe in recipes]
+            )
+            bodies = recipe_cache.get_bodies(keys)
+        prefetch_related_objects(
+            [
+                recipe for recipe in recipes
+                if recipe.pk not in bodies
+                and 'recipe_products' not in getattr(
+                    recipe, '_prefetched_objects_cache', {}
+                )
+            ],
+            'recipe_products__ingredient', 'tags'
         )
+        data, missing = [], {}
+        for recipe in recipes:
+            if recipe.pk in bodies:
+                data.append(self.overlay(recipe, bodies[recipe.pk]))
+                continue
+            representation = super().to_representation(recipe)
+            data.append(representation)
+            if keys:
+                body = representation.copy()
+                for name in self.overlay_fields:
+                    body.pop(name, None)
+                body['author'] = {**body['author'], 'is_subscribed': None}
+                missing[keys[recipe.pk]] = body
+        if missing:
+            recipe_cache.set_bodies(missing)
+        return data
+
+    def overlay(self, recipe, body):
+        representation = OrderedDict(
+            (
+                field.field_name,
+                field.to_representation(field.get_attribute(recipe))
+                if field.field_name in self.overlay_fields
+                else body[field.field_name]
+            )
+            for field in self._readable_fields
+        )
+        representation['author']['is_subscribed'] = (
+            self.fields['author'].get_is_subscribed(recipe.author)
+        )
+        return representation
+
+    def get_image_srcset(self, recipe):
+        if not recipe.image_processed:
+            return {}
+        request = self.context.get('request')
+        return {
+            extension: ', '.join(
+                '{} {}w'.format(
+                    request.build_absolute_uri(default_storage.url(name))
+                    if request else default_storage.url(name),
+                    width
+                )
+                for width, name in names.items()
+            )
+            for extension, names in recipe.image_renditions.items()
+        }
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         user = self.context['request'].user
-        return user.is_authenticated and user.favorite_recipes.filter(
-            pk=recipe.id
+        return user.is_authenticated and Favorite.objects.filter(
+            user=user, recipe=recipe
         ).exists()
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         user = self.context['request'].user
-        return user.is_authenticated and user.shopping_recipes.filter(
-            pk=recipe.id
+        return user.is_authenticated and ShoppingCartItem.objects.filter(
+            user=user, recipe=recipe
         ).exists()
 
     @staticmethod
@@ -99,47 +244,108 @@ class RecipeSerializer(serializers.ModelSerializer):
         return value
 
     @staticmethod
-    def check_duplicates(values):
-        duplicates = {value.id for value in values if values.count(value) > 1}
+    def check_duplicates(ids):
+        duplicates = {id for id, count in Counter(ids).items() if count > 1}
         if duplicates:
             raise serializers.ValidationError(
                 f'Значения дублируются: {duplicates}'
             )
-        return values
+        return ids
 
     def validate_image(self, image):
         return self.check_empty(image)
 
     def validate_tags(self, tags):
-        tags = self.check_empty(tags)
-        return self.check_duplicates(tags)
+        self.check_duplicates([tag.id for tag in self.check_empty(tags)])
+        return tags
 
     def validate_ingredients(self, products):
-        self.check_duplicates([
-            product['ingredient'] for product in self.check_empty(products)
+        ids = self.check_duplicates([
+            product['ingredient_id']
+            for product in self.check_empty(products)
+        ])
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = [id for id in ids if id not in ingredients]
+        if missing:
+            raise serializers.ValidationError(
+                f'Продукты не найдены: {missing}'
+            )
+        return [
+            {
+                **{
+                    field: value for field, value in product.items()
+                    if field != 'ingredient_id'
+                },
+                'ingredient': ingredients[product['ingredient_id']],
+            }
+            for product in products
+        ]
+
+    @staticmethod
+    def create_products(recipe, products):
+        RecipeProduct.objects.bulk_create(
+            RecipeProduct(recipe=recipe, **product)
+            for product in products
+        )
+        ingredient_ids = [product['ingredient'].id for product in products]
+        change_counter(Ingredient, ingredient_ids, 'recipes_count')
+        transaction.on_commit(
+            lambda: recipe_coverage_index.add(recipe.pk, ingredient_ids)
+        )
+
+    @staticmethod
+    def delete_products(recipe, products):
+        if not products:
+            return
+        with batched_counters():
+            RecipeProduct.objects.filter(
+                pk__in=[product.pk for product in products]
+            ).delete()
+
+    @classmethod
+    def update_products(cls, recipe, products):
+        existing = {
+            product.ingredient_id: product
+            for product in recipe.recipe_products.all()
+        }
+        amounts = {
+            product['ingredient'].id: product['amount'] for product in products
+        }
+        changed = []
+        for ingredient_id, product in existing.items():
+            amount = amounts.get(ingredient_id, product.amount)
+            if product.amount != amount:
+                product.amount = amount
+                changed.append(product)
+        cls.delete_products(recipe, [
+            product for ingredient_id, product in existing.items()
+            if ingredient_id not in amounts
+        ])
+        RecipeProduct.objects.bulk_update(changed, ['amount'])
+        cls.create_products(recipe, [
+            product for product in products
+            if product['ingredient'].id not in existing
         ])
-        return products
 
+    @transaction.atomic
     def create(self, validated_data):
         products = validated_data.pop('recipe_products')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        RecipeProduct.objects.bulk_create(
-            RecipeProduct(recipe=recipe, **product)
-            for product in products
-        )
+        self.create_products(recipe, products)
+        update_search_index([recipe.pk])
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         if 'tags' in validated_data:
             recipe.tags.set(validated_data.pop('tags'))
         if 'recipe_products' in validated_data:
-            recipe.ingredients.clear()
-            RecipeProduct.objects.bulk_create(
-                RecipeProduct(recipe=recipe, **product)
-                for product in validated_data.pop('recipe_products')
+            self.update_products(
+                recipe, validated_data.pop('recipe_products')
             )
+            recipe.indexed_values = None
         return super().update(recipe, validated_data)
 
 
@@ -151,19 +357,31 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class RecipeCoverageSerializer(RecipeSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    matched_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = (*RecipeSerializer.Meta.fields, 'coverage', 'matched_count')
+
+    overlay_fields = (
+        *RecipeSerializer.overlay_fields, 'coverage', 'matched_count'
+    )
+
+
 class SubscribingSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = (*UserSerializer.Meta.fields, 'recipes', 'recipes_count')
         read_only_fields = fields
 
     def get_recipes(self, user):
-        limit = int(
-            self.context['request'].query_params.get('recipes_limit', 10**10)
-        )
-        return RecipeReadSerializer(user.recipes.all()[:limit], many=True).data
-
-    def get_recipes_count(self, user):
-        return user.recipes.count()
+        if hasattr(user, 'preview_recipes'):
+            recipes = user.preview_recipes
+        else:
+            recipes = user.recipes.all()
+            limit = get_recipes_limit(self.context['request'])
+            if limit is not None:
+                recipes = recipes[:limit]
+        return RecipeReadSerializer(recipes, many=True).data
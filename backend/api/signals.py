@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, RecipeProduct, Tag, User
+from recipes.signals import (
+    catalog_imported,
+    get_replaced_ingredient_id,
+    recipe_image_processed
+)
+from .authentication import token_cache
+from .cache import recipe_cache
+from .catalog import ingredient_catalog, invalidate_tag_ids, tag_catalog
+from .search import ingredient_index, recipe_coverage_index
+
+
+def invalidate_recipe_responses(*scopes):
+    transaction.on_commit(
+        lambda: recipe_cache.invalidate(*(scopes or ['catalog']))
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(catalog_imported, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+    transaction.on_commit(ingredient_catalog.invalidate)
+    invalidate_recipe_responses()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(catalog_imported, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    transaction.on_commit(tag_catalog.invalidate)
+    transaction.on_commit(invalidate_tag_ids)
+    invalidate_recipe_responses()
+
+
+@receiver(post_save, sender=RecipeProduct)
+def index_saved_product(sender, instance, created, **kwargs):
+    previous = None if created else get_replaced_ingredient_id(instance)
+    if previous is not None:
+        transaction.on_commit(lambda: recipe_coverage_index.remove(
+            instance.recipe_id, [previous]
+        ))
+    if created or previous is not None:
+        transaction.on_commit(lambda: recipe_coverage_index.add(
+            instance.recipe_id, [instance.ingredient_id]
+        ))
+
+
+@receiver(post_delete, sender=RecipeProduct)
+def unindex_deleted_product(sender, instance, **kwargs):
+    transaction.on_commit(lambda: recipe_coverage_index.remove(
+        instance.recipe_id, [instance.ingredient_id]
+    ))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(recipe_image_processed, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate_recipe_responses('list', f'recipe:{instance.pk}')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields, **kwargs):
+    if created or not instance.recipes_count or (
+        update_fields is not None
+        and not set(update_fields) - {'last_login'}
+    ):
+        return
+    invalidate_recipe_responses('list', *(
+        f'recipe:{pk}'
+        for pk in instance.recipes.values_list('pk', flat=True)
+    ))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    transaction.on_commit(lambda: token_cache.remove_user(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(
+    sender, instance, created, update_fields, **kwargs
+):
+    if created:
+        return
+    if update_fields is not None and not (
+        set(instance.auth_fields) & set(update_fields)
+    ):
+        return
+    values = instance.get_auth_values()
+    if getattr(instance, 'auth_values', None) != values:
+        transaction.on_commit(lambda: token_cache.remove_user(instance.pk))
+        instance.auth_values = values
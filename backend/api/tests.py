@@ -0,0 +1,1152 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from recipes.counters import COUNTERS, recount
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeProduct,
+    ShoppingCartItem,
+    Subscription,
+    Tag,
+    User
+)
+from .authentication import TokenCache, token_cache
+from .cache import recipe_cache
+from .catalog import CatalogCache, tag_catalog
+from .db import defer_health_checks
+from .middleware import (
+    QueryProfile,
+    SQLProfilingMiddleware,
+    get_fingerprint,
+    install_profiler,
+    profile_queries
+)
+from .search import recipe_coverage_index
+from .serializers import RecipeSerializer, TagSerializer
+
+RECIPES_URL = '/api/recipes/'
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+INGREDIENT_COUNTER = ('recipes_count', RecipeProduct, 'ingredient')
+
+
+class FoodgramTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+
+class RecipeTestCase(FoodgramTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {index}', color=f'#00000{index}', slug=f'tag{index}'
+            )
+            for index in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {index}', measurement_unit='г'
+            )
+            for index in range(10)
+        ]
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{index}@example.org',
+                username=f'user{index}',
+                first_name='Имя',
+                last_name='Фамилия',
+                password='password-123'
+            )
+            for index in range(3)
+        ]
+        cls.recipes = []
+        for index in range(25):
+            recipe = Recipe.objects.create(
+                author=cls.users[index % len(cls.users)],
+                name=f'Рецепт {index}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/test.png'
+            )
+            recipe.tags.set(cls.tags[:1 + index % len(cls.tags)])
+            RecipeProduct.objects.bulk_create(
+                RecipeProduct(
+                    recipe=recipe,
+                    ingredient=cls.ingredients[(index + shift) % 10],
+                    amount=shift + 1
+                )
+                for shift in range(3)
+            )
+            cls.recipes.append(recipe)
+
+
+class RecipeListQueriesTest(RecipeTestCase):
+
+    def assert_list_queries(self, count):
+        self.client.get(RECIPES_URL)
+        for limit in (2, 20):
+            with self.subTest(limit=limit), self.assertNumQueries(count):
+                response = self.client.get(RECIPES_URL, {'limit': limit})
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous(self):
+        self.assert_list_queries(5)
+
+    def test_authenticated(self):
+        self.client.force_authenticate(self.users[0])
+        self.assert_list_queries(6)
+
+
+class SubscribedFlagTest(RecipeTestCase):
+
+    def test_subscriptions_loaded_once_per_request(self):
+        user, author = self.users[:2]
+        Subscription.objects.create(user=user, subscribing=author)
+        self.client.force_authenticate(user)
+        for url in (RECIPES_URL, '/api/users/'):
+            for limit in (2, 20):
+                with self.subTest(url=url, limit=limit):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(url, {'limit': limit})
+                    self.assertEqual(len([
+                        query for query in queries.captured_queries
+                        if 'FROM "recipes_subscription"' in query['sql']
+                    ]), 1)
+                    for item in response.data['results']:
+                        item = item.get('author', item)
+                        self.assertEqual(
+                            item['is_subscribed'], item['id'] == author.pk
+                        )
+
+
+class CountersTest(RecipeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for counter in COUNTERS:
+            recount(*counter)
+
+    def assert_counters(self):
+        for counter in COUNTERS:
+            with self.subTest(counter=f'{counter[0].__name__}.{counter[1]}'):
+                self.assertEqual(recount(*counter), 0)
+
+    def test_recipe_create_and_delete(self):
+        author = self.users[0]
+        recipe = RecipeSerializer().create({
+            'author': author,
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': 'recipes/images/test.png',
+            'tags': self.tags[:2],
+            'recipe_products': [
+                {'ingredient': ingredient, 'amount': 1}
+                for ingredient in self.ingredients[:3]
+            ],
+        })
+        author.refresh_from_db()
+        self.assertEqual(author.recipes_count, author.recipes.count())
+        self.assert_counters()
+        self.client.force_authenticate(author)
+        response = self.client.delete(f'{RECIPES_URL}{recipe.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assert_counters()
+
+    def test_favorites_and_subscriptions(self):
+        user, author = self.users[:2]
+        recipe = self.recipes[1]
+        self.client.force_authenticate(user)
+        for method, code in (
+            ('post', status.HTTP_201_CREATED),
+            ('delete', status.HTTP_204_NO_CONTENT),
+        ):
+            with self.subTest(method=method):
+                for url in (
+                    f'{RECIPES_URL}{recipe.pk}/favorite/',
+                    f'/api/users/{author.pk}/subscribe/',
+                ):
+                    response = getattr(self.client, method)(url)
+                    self.assertEqual(response.status_code, code)
+                self.assert_counters()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+
+    def test_tag_m2m_changes(self):
+        recipe, tag = self.recipes[0], self.tags[2]
+        for change in (
+            lambda: recipe.tags.add(tag),
+            lambda: recipe.tags.remove(tag),
+            lambda: recipe.tags.set(self.tags[1:]),
+            lambda: recipe.tags.clear(),
+            lambda: tag.recipes.add(*self.recipes[:5]),
+            lambda: tag.recipes.remove(self.recipes[0]),
+            lambda: tag.recipes.clear(),
+        ):
+            change()
+            self.assert_counters()
+
+
+class RecipeCursorPaginationTest(RecipeTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in cls.recipes[::2]]
+        ).update(pub_date=cls.recipes[0].pub_date)
+
+    def walk(self, url, link):
+        ids = []
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            for query in queries.captured_queries:
+                self.assertNotIn('OFFSET', query['sql'])
+            ids.append([recipe['id'] for recipe in response.data['results']])
+            if response.data[link] is None:
+                return ids, url
+            url = response.data[link]
+
+    def test_pages_follow_pub_date_and_id(self):
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('pk', flat=True))
+        pages, last_page = self.walk(
+            f'{RECIPES_URL}?pagination=cursor&limit=4', 'next'
+        )
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(len(pages[-1]), len(expected) % 4)
+        pages, _ = self.walk(last_page, 'previous')
+        self.assertEqual(sum(reversed(pages), []), expected)
+
+
+class FavoriteToggleTest(RecipeTestCase):
+    FAVORITED_BY = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipe = cls.recipes[0]
+        User.objects.bulk_create(
+            User(
+                username=f'follower{index}',
+                email=f'follower{index}@example.org',
+                first_name='Имя',
+                last_name='Фамилия'
+            )
+            for index in range(cls.FAVORITED_BY)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=cls.recipe)
+            for user in User.objects.filter(username__startswith='follower')
+        )
+
+    def toggle(self, recipe):
+        url = f'{RECIPES_URL}{recipe.pk}/favorite/'
+        measurements = []
+        for method, expected_status in [
+            ('post', status.HTTP_201_CREATED),
+            ('delete', status.HTTP_204_NO_CONTENT),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url)
+            self.assertEqual(response.status_code, expected_status)
+            measurements.append(
+                [query['sql'] for query in queries.captured_queries]
+            )
+        return measurements
+
+    def test_toggle_does_not_depend_on_favorites(self):
+        self.client.force_authenticate(self.users[1])
+        self.toggle(self.recipes[1])
+        small = self.toggle(self.recipes[1])
+        large = self.toggle(self.recipe)
+        for small_queries, large_queries in zip(small, large):
+            self.assertEqual(len(large_queries), len(small_queries))
+            for sql in large_queries:
+                self.assertNotIn('COUNT(', sql.upper())
+
+    def test_repeated_add_is_rejected(self):
+        self.client.force_authenticate(self.users[1])
+        for model, url in [
+            (Favorite, f'{RECIPES_URL}{self.recipe.pk}/favorite/'),
+            (
+                ShoppingCartItem,
+                f'{RECIPES_URL}{self.recipe.pk}/shopping_cart/'
+            ),
+        ]:
+            with self.subTest(model=model.__name__):
+                self.client.post(url)
+                response = self.client.post(url)
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertEqual(model.objects.filter(
+                    user=self.users[1], recipe=self.recipe
+                ).count(), 1)
+
+
+class IngredientSearchTest(FoodgramTestCase):
+
+    def test_prefix_matches_come_first(self):
+        Ingredient.objects.create(name='Сахар', measurement_unit='г')
+        Ingredient.objects.create(name='Ванильный сахар', measurement_unit='г')
+        response = self.client.get('/api/ingredients/', {'name': 'сах'})
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.data],
+            ['Сахар', 'Ванильный сахар']
+        )
+
+
+class CatalogCacheTest(FoodgramTestCase):
+
+    def setUp(self):
+        super().setUp()
+        tag_catalog.invalidate()
+        Tag.objects.create(name='Завтрак', color='#000000', slug='breakfast')
+
+    def get_tag_names(self):
+        response = self.client.get('/api/tags/')
+        return [tag['name'] for tag in json.loads(response.content)]
+
+    def create_tag(self):
+        Tag.objects.create(name='Ужин', color='#FFFFFF', slug='dinner')
+
+    def test_hit(self):
+        first = self.client.get('/api/tags/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/tags/')
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.content, first.content)
+
+    def test_invalidation_waits_for_commit(self):
+        self.get_tag_names()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_tag()
+            self.assertEqual(self.get_tag_names(), ['Завтрак'])
+        self.assertEqual(self.get_tag_names(), ['Завтрак', 'Ужин'])
+
+    def test_invalidation_during_render_wins(self):
+        render = tag_catalog.render
+
+        def render_and_invalidate(version):
+            entry = render(version)
+            tag_catalog.invalidate()
+            return entry
+
+        with mock.patch.object(tag_catalog, 'render', render_and_invalidate):
+            tag_catalog.get()
+        self.assertIsNone(tag_catalog.entry)
+
+    @override_settings(CATALOG_CACHE='default')
+    def test_shared_version(self):
+        other = CatalogCache('tags', Tag.objects.all, TagSerializer)
+        self.assertEqual(other.get(), tag_catalog.get())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_tag()
+        with self.assertNumQueries(1):
+            self.assertEqual(other.get(), tag_catalog.get())
+        self.assertEqual(
+            [tag['name'] for tag in json.loads(other.get()[1])],
+            ['Завтрак', 'Ужин']
+        )
+
+
+class ShoppingCartDownloadTest(RecipeTestCase):
+    URL = f'{RECIPES_URL}download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = cls.users[1]
+        for recipe in cls.recipes[:2]:
+            ShoppingCartItem.objects.create(user=cls.user, recipe=recipe)
+        RecipeProduct.objects.create(
+            recipe=cls.recipes[0],
+            ingredient=Ingredient.objects.create(
+                name=cls.ingredients[1].name, measurement_unit='кг'
+            ),
+            amount=7
+        )
+
+    def download(self, **kwargs):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.URL, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content)
+
+    def test_formats(self):
+        for extension, content_type in [
+            ('txt', 'text/plain; charset=utf-8'),
+            ('csv', 'text/csv; charset=utf-8'),
+            ('pdf', 'application/pdf'),
+        ]:
+            with self.subTest(extension=extension):
+                response, content = self.download(data={'format': extension})
+                self.assertEqual(response['Content-Type'], content_type)
+                self.assertEqual(
+                    response['Content-Disposition'],
+                    f'attachment; filename="shopping_list.{extension}"'
+                )
+                if extension == 'pdf':
+                    self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_products_are_grouped_by_name_and_unit(self):
+        _, content = self.download(data={'format': 'csv'})
+        self.assertEqual(list(csv.reader(io.StringIO(content.decode()))), [
+            ['Продукт', 'Единица измерения', 'Количество'],
+            ['Продукт 0', 'г', '1'],
+            ['Продукт 1', 'г', '3'],
+            ['Продукт 1', 'кг', '7'],
+            ['Продукт 2', 'г', '5'],
+            ['Продукт 3', 'г', '3'],
+        ])
+        _, content = self.download()
+        lines = content.decode().splitlines()
+        self.assertEqual(lines[lines.index('Продукты:') + 1:], [
+            '1. 1 г - Продукт 0',
+            '2. 3 г - Продукт 1',
+            '3. 7 кг - Продукт 1',
+            '4. 5 г - Продукт 2',
+            '5. 3 г - Продукт 3',
+        ])
+
+    def test_json_accept_gets_text_file(self):
+        response, _ = self.download(HTTP_ACCEPT='application/json')
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8'
+        )
+
+    def test_errors_are_json(self):
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', json.loads(response.content))
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.URL, HTTP_ACCEPT='image/png')
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+class ImageProcessingTest(FoodgramTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.author = User.objects.create_user(
+            email='author@example.org',
+            username='author',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password-123'
+        )
+
+    @staticmethod
+    def save_image():
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, 'PNG')
+        return default_storage.save(
+            'recipes/images/test.png', ContentFile(buffer.getvalue())
+        )
+
+    def create_recipe(self, **kwargs):
+        return Recipe.objects.create(
+            author=self.author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10,
+            image=self.save_image(),
+            **kwargs
+        )
+
+    @staticmethod
+    def get_files(recipe):
+        return [
+            name for names in recipe.image_renditions.values()
+            for name in names.values()
+        ]
+
+    def process_images(self):
+        call_command('process_images', stdout=io.StringIO())
+
+    def test_images_are_rendered_outside_the_claim_transaction(self):
+        recipe = self.create_recipe()
+        savepoints = len(connection.savepoint_ids)
+        with mock.patch(
+            'recipes.management.commands.process_images.'
+            'process_recipe_image',
+            side_effect=lambda recipe: self.assertEqual(
+                len(connection.savepoint_ids), savepoints
+            )
+        ) as process_recipe_image:
+            self.process_images()
+        process_recipe_image.assert_called_once()
+        recipe.refresh_from_db()
+        self.assertIsNotNone(recipe.image_claimed_at)
+
+    def test_claimed_images_wait_for_claim_timeout(self):
+        claimed = self.create_recipe(image_claimed_at=timezone.now())
+        expired = self.create_recipe(
+            image_claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        self.process_images()
+        claimed.refresh_from_db()
+        expired.refresh_from_db()
+        self.assertFalse(claimed.image_processed)
+        self.assertTrue(expired.image_processed)
+        self.assertIsNone(expired.image_claimed_at)
+        self.assertEqual(len(self.get_files(expired)), 6)
+        for name in self.get_files(expired):
+            self.assertTrue(default_storage.exists(name))
+
+    def test_renditions_are_deleted_with_image_or_recipe(self):
+        recipe = self.create_recipe()
+        self.process_images()
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        files = self.get_files(recipe)
+        recipe.image = self.save_image()
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_renditions, {})
+        self.assertFalse(recipe.image_processed)
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
+        self.process_images()
+        recipe.refresh_from_db()
+        files = self.get_files(recipe)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
+
+
+class SubscriptionsTest(RecipeTestCase):
+
+    def test_previews_are_limited_to_page_authors(self):
+        user = self.users[0]
+        for author in self.users[1:]:
+            Subscription.objects.create(user=user, subscribing=author)
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/users/subscriptions/', {'limit': 1, 'recipes_limit': 2}
+            )
+        author = self.users[1]
+        self.assertEqual(
+            [subscribing['id'] for subscribing in response.data['results']],
+            [author.pk]
+        )
+        recipes = response.data['results'][0]['recipes']
+        self.assertEqual(
+            [recipe['id'] for recipe in recipes],
+            list(author.recipes.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )[:2])
+        )
+        ranked = [
+            query['sql'] for query in queries.captured_queries
+            if 'ROW_NUMBER' in query['sql']
+        ]
+        self.assertEqual(len(ranked), 1)
+        self.assertIn(f'author_id IN ({author.pk})', ranked[0])
+
+
+class CatalogImportTest(FoodgramTestCase):
+
+    def load_tags(self, tags, *args):
+        stderr = io.StringIO()
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', encoding='utf-8'
+        ) as file:
+            json.dump(tags, file)
+            file.flush()
+            call_command(
+                'load_tags', file.name, *args,
+                stdout=io.StringIO(), stderr=stderr
+            )
+        return stderr.getvalue()
+
+    def test_import_invalidates_tag_cache(self):
+        response = self.client.get(RECIPES_URL, {'tags': 'new'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load_tags(
+                [{'name': 'Новый', 'color': '#FFFFFF', 'slug': 'new'}]
+            )
+        response = self.client.get(RECIPES_URL, {'tags': 'new'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+
+    def test_conflicting_rows_are_skipped(self):
+        Tag.objects.create(name='Завтрак', color='#000000', slug='breakfast')
+        Tag.objects.create(name='Обед', color='#111111', slug='lunch')
+        errors = self.load_tags([
+            {'name': 'Завтрак', 'color': '#222222', 'slug': 'morning'},
+            {'name': 'Ужин', 'color': '#000000', 'slug': 'dinner'},
+            {'name': 'Полдник', 'color': '#333333', 'slug': 'snack'},
+            {'name': 'Полдник', 'color': '#444444', 'slug': 'tea'},
+            {'name': 'Обед', 'color': '#555555', 'slug': 'breakfast'},
+        ], '--upsert')
+        self.assertEqual(len(errors.splitlines()), 4)
+        self.assertEqual(
+            dict(Tag.objects.values_list('slug', 'name')),
+            {'breakfast': 'Завтрак', 'lunch': 'Обед', 'snack': 'Полдник'}
+        )
+
+
+class RecipeUpdateWritesTest(RecipeTestCase):
+
+    def patch_ingredients(self, recipe, ingredients):
+        self.client.force_authenticate(recipe.author)
+        with self.captureOnCommitCallbacks(execute=True), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'{RECIPES_URL}{recipe.pk}/',
+                {
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': 5}
+                        for ingredient in ingredients
+                    ]
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(WRITE_STATEMENTS)
+        ]
+
+    def test_writes_do_not_grow_with_removed_ingredients(self):
+        recipe = self.recipes[0]
+        RecipeProduct.objects.bulk_create(
+            RecipeProduct(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in self.ingredients[3:6]
+        )
+        recipe.recipe_products.update(amount=5)
+        recount(Ingredient, *INGREDIENT_COUNTER)
+        kept = list(Ingredient.objects.filter(
+            recipe_products__recipe=recipe
+        ).order_by('pk'))
+        recipe_coverage_index.invalidate()
+        recipe_coverage_index.get_index()
+        removed_one = self.patch_ingredients(recipe, kept[1:])
+        removed_many = self.patch_ingredients(recipe, kept[-1:])
+        self.assertEqual(len(removed_many), len(removed_one))
+        self.assertEqual(recount(Ingredient, *INGREDIENT_COUNTER), 0)
+        self.assertEqual(
+            list(recipe.recipe_products.values_list('amount', flat=True)),
+            [5]
+        )
+        postings, _ = recipe_coverage_index.get_index()
+        for ingredient in kept[:-1]:
+            self.assertNotIn(recipe.pk, postings.get(ingredient.pk, ()))
+
+
+class RecipeValidationTest(RecipeTestCase):
+
+    def validate(self, tags, ingredients):
+        serializer = RecipeSerializer(data={
+            'tags': [tag.pk for tag in tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 1}
+                for ingredient in ingredients
+            ],
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+        })
+        serializer.is_valid()
+        return serializer.errors
+
+    def test_lookups_do_not_grow_with_items(self):
+        for count in (1, 3):
+            with self.subTest(count=count), self.assertNumQueries(2):
+                errors = self.validate(
+                    self.tags[:count], self.ingredients[:count * 3]
+                )
+            self.assertEqual(list(errors), ['image'])
+
+    def test_missing_and_duplicate_items(self):
+        missing = Ingredient(pk=0)
+        for tags, ingredients, field in [
+            ([Tag(pk=0)], self.ingredients[:1], 'tags'),
+            (self.tags[:1], [self.ingredients[0], missing], 'ingredients'),
+            (self.tags[:1] * 2, self.ingredients[:1], 'tags'),
+            (self.tags[:1], self.ingredients[:1] * 2, 'ingredients'),
+        ]:
+            with self.subTest(field=field):
+                self.assertIn(field, self.validate(tags, ingredients))
+
+    def test_input_is_not_mutated(self):
+        products = [{'ingredient_id': self.ingredients[0].pk, 'amount': 1}]
+        validated = RecipeSerializer().validate_ingredients(products)
+        self.assertEqual(
+            products, [{'ingredient_id': self.ingredients[0].pk, 'amount': 1}]
+        )
+        self.assertEqual(
+            validated, [{'amount': 1, 'ingredient': self.ingredients[0]}]
+        )
+
+
+class RecipeSearchTest(RecipeTestCase):
+
+    def test_search_rejects_cursor_pagination(self):
+        for params in [
+            {'search': 'Рецепт', 'pagination': 'cursor'},
+            {'search': 'Рецепт', 'cursor': 'cD0y'},
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(RECIPES_URL, params)
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertIn('search', response.data)
+
+    def test_search_keeps_page_pagination(self):
+        response = self.client.get(
+            RECIPES_URL, {'search': 'Рецепт', 'limit': 5}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], len(self.recipes))
+
+    def test_search_vector_is_not_selected(self):
+        self.client.force_authenticate(self.users[0])
+        for url in [RECIPES_URL, f'{RECIPES_URL}{self.recipes[0].pk}/']:
+            with self.subTest(url=url), \
+                    CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            for query in queries.captured_queries:
+                self.assertNotIn('search_vector', query['sql'])
+
+    def test_reindex_only_when_indexed_data_changes(self):
+        recipe = self.recipes[0]
+        self.client.force_authenticate(recipe.author)
+        for data, reindexed in [
+            ({'cooking_time': 20}, False),
+            ({'name': recipe.name}, False),
+            ({'name': 'Новое название'}, True),
+            ({'ingredients': [{'id': self.ingredients[5].pk, 'amount': 1}]},
+             True),
+        ]:
+            with self.subTest(data=data), mock.patch(
+                'recipes.signals.update_search_index'
+            ) as update_search_index:
+                response = self.client.patch(
+                    f'{RECIPES_URL}{recipe.pk}/', data, format='json'
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(update_search_index.called, reindexed)
+
+
+class RecipeProductChangeTest(RecipeTestCase):
+
+    def get_matches(self, ingredient):
+        response = self.client.get(
+            f'{RECIPES_URL}by_ingredients/',
+            {'ingredients': ingredient.pk, 'limit': len(self.recipes)}
+        )
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_changed_ingredient_moves_index_and_counters(self):
+        recount(Ingredient, *INGREDIENT_COUNTER)
+        recipe_coverage_index.invalidate()
+        old, new = self.ingredients[0], Ingredient.objects.create(
+            name='Новый продукт', measurement_unit='г'
+        )
+        self.assertIn(self.recipes[0].pk, self.get_matches(old))
+        product = self.recipes[0].recipe_products.get(ingredient=old)
+        product.ingredient = new
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertNotIn(self.recipes[0].pk, self.get_matches(old))
+        self.assertEqual(self.get_matches(new), [self.recipes[0].pk])
+        self.assertEqual(recount(Ingredient, *INGREDIENT_COUNTER), 0)
+
+    def test_changes_do_not_touch_published_index(self):
+        recipe_coverage_index.invalidate()
+        ingredient = self.ingredients[0]
+        postings, sizes = recipe_coverage_index.get_index()
+        recipes, size = list(postings[ingredient.pk]), dict(sizes)
+        recipe_coverage_index.remove(recipes[0], [ingredient.pk])
+        recipe_coverage_index.add(self.recipes[-1].pk, [ingredient.pk])
+        self.assertEqual(list(postings[ingredient.pk]), recipes)
+        self.assertEqual(dict(sizes), size)
+        self.assertNotIn(
+            recipes[0], recipe_coverage_index.get_index()[0][ingredient.pk]
+        )
+
+    def test_rank_pages_match_full_sort(self):
+        recipe_coverage_index.invalidate()
+        ingredient_ids = [ingredient.pk for ingredient in self.ingredients[:4]]
+        ranked = recipe_coverage_index.rank(ingredient_ids)
+        expected = sorted(ranked.scores, reverse=True)
+        self.assertEqual(len(ranked), len(expected))
+        for start in range(0, len(expected), 4):
+            self.assertEqual(
+                ranked[start:start + 4], expected[start:start + 4]
+            )
+
+
+class RecipeTagsFilterTest(RecipeTestCase):
+
+    def test_multiple_tags(self):
+        expected = {
+            recipe.pk for recipe in self.recipes
+            if recipe.tags.filter(slug__in=['tag1', 'tag2']).exists()
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPES_URL, {
+                'tags': ['tag1', 'tag2'], 'limit': len(self.recipes)
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), expected)
+        self.assertEqual(response.data['count'], len(expected))
+        recipe_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "recipes_recipe" ' in query['sql']
+        ]
+        self.assertEqual(len(recipe_queries), 2)
+        for sql in recipe_queries:
+            with self.subTest(sql=sql[:40]):
+                self.assertIn('EXISTS', sql)
+                self.assertNotIn('DISTINCT', sql)
+                self.assertNotIn('JOIN "recipes_recipe_tags"', sql)
+
+    def test_unknown_tag(self):
+        response = self.client.get(RECIPES_URL, {'tags': ['tag1', 'unknown']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConnectionHealthCheckTest(FoodgramTestCase):
+
+    def test_check_deferred_to_first_query(self):
+        with mock.patch.object(
+            connection, 'is_usable', return_value=True
+        ) as is_usable:
+            defer_health_checks(sender=None)
+            is_usable.assert_not_called()
+            Tag.objects.exists()
+            Tag.objects.exists()
+        is_usable.assert_called_once()
+        self.assertNotIn('ensure_connection', vars(connection))
+
+    def test_checked_once_per_request(self):
+        with mock.patch.object(connection, 'is_usable') as is_usable:
+            defer_health_checks(sender=None)
+            defer_health_checks(sender=None)
+            connection.ensure_connection()
+        is_usable.assert_called_once()
+
+    def test_unusable_connection_closed(self):
+        with mock.patch.object(
+            connection, 'is_usable', return_value=False
+        ), mock.patch.object(connection, 'close') as close:
+            defer_health_checks(sender=None)
+            Tag.objects.exists()
+        close.assert_called_once()
+
+
+class SQLProfilingTest(FoodgramTestCase):
+
+    def setUp(self):
+        super().setUp()
+        install_profiler(sender=None, connection=connection)
+        self.addCleanup(connection.execute_wrappers.remove, profile_queries)
+
+    def profile(self, queries):
+        def view(request):
+            for pk in range(queries):
+                Tag.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        with self.assertLogs('api.sql', 'INFO') as logs:
+            response = SQLProfilingMiddleware(view)(
+                RequestFactory().get('/api/tags/')
+            )
+        return response, json.loads(logs.records[0].getMessage()), logs
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            get_fingerprint(
+                "SELECT 1 FROM t WHERE id IN (%s, %s) AND name = 'a''b' "
+                'AND amount > 10'
+            ),
+            'SELECT %s FROM t WHERE id IN (...) AND name = %s '
+            'AND amount > %s'
+        )
+
+    def test_report(self):
+        response, data, logs = self.profile(2)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(data['queries'], 2)
+        self.assertEqual(data['repeated'][0]['count'], 2)
+        self.assertNotIn('n_plus_one', data)
+
+    @override_settings(SQL_PROFILING_REPEAT_LIMIT=3)
+    def test_n_plus_one_warning(self):
+        _, data, logs = self.profile(4)
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        self.assertTrue(data['n_plus_one'])
+
+    def test_queries_outside_requests_are_not_profiled(self):
+        with mock.patch.object(QueryProfile, '__call__') as profile:
+            Tag.objects.exists()
+        profile.assert_not_called()
+
+
+@override_settings(RECIPE_CACHE='default')
+class RecipeCacheInvalidationTest(RecipeTestCase):
+
+    def get_versions(self, recipe):
+        return recipe_cache.get_versions(
+            'catalog', 'list', f'recipe:{recipe.pk}'
+        )
+
+    def save_user(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+    def test_users_without_recipes_keep_cache(self):
+        versions = self.get_versions(self.recipes[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            reader = User.objects.create_user(
+                email='reader@example.org',
+                username='reader',
+                first_name='Имя',
+                last_name='Фамилия',
+                password='password-123'
+            )
+        reader.first_name = 'Читатель'
+        self.save_user(reader)
+        self.assertEqual(self.get_versions(self.recipes[0]), versions)
+
+    def test_author_change_invalidates_own_recipes(self):
+        author = User.objects.get(pk=self.recipes[0].author_id)
+        other = next(
+            recipe for recipe in self.recipes
+            if recipe.author_id != author.pk
+        )
+        catalog, list_version, recipe_version = self.get_versions(
+            self.recipes[0]
+        )
+        other_version = self.get_versions(other)[2]
+        author.first_name = 'Автор'
+        self.save_user(author)
+        versions = self.get_versions(self.recipes[0])
+        self.assertEqual(versions[0], catalog)
+        self.assertNotEqual(versions[1], list_version)
+        self.assertNotEqual(versions[2], recipe_version)
+        self.assertEqual(self.get_versions(other)[2], other_version)
+
+    def test_non_canonical_pk_is_invalidated(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        paths = [f'{RECIPES_URL}{recipe.pk}/', f'{RECIPES_URL}0{recipe.pk}/']
+        for path in paths:
+            self.client.get(path)
+        recipe.name = 'Новое название'
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        for path in paths:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(
+                    json.loads(response.content)['name'], recipe.name
+                )
+
+
+@override_settings(RECIPE_CACHE='default')
+class RecipeBodyCacheTest(RecipeTestCase):
+
+    def get_list(self, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPES_URL, {'limit': 5})
+        return response.data['results'], [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "recipes_recipeproduct"' in query['sql']
+            or 'JOIN "recipes_recipe_tags"' in query['sql']
+        ]
+
+    def test_bodies_are_shared_with_user_flags(self):
+        reader, author = self.users[:2]
+        recipe = Recipe.objects.get(pk=self.get_list(reader)[0][0]['id'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=reader, recipe=recipe)
+            ShoppingCartItem.objects.create(user=reader, recipe=recipe)
+            Subscription.objects.create(
+                user=reader, subscribing=recipe.author
+            )
+        for user, flag in ((reader, True), (author, False)):
+            with self.subTest(user=user.username):
+                results, queries = self.get_list(user)
+                self.assertEqual(queries, [])
+                self.assertEqual(results[0]['is_favorited'], flag)
+                self.assertEqual(results[0]['is_in_shopping_cart'], flag)
+                self.assertEqual(
+                    results[0]['author']['is_subscribed'], flag
+                )
+                self.assertEqual(
+                    [item['is_favorited'] for item in results[1:]],
+                    [False] * 4
+                )
+
+    def test_update_refreshes_body(self):
+        results, _ = self.get_list(self.users[0])
+        recipe = Recipe.objects.get(pk=results[0]['id'])
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeSerializer().update(recipe, {
+                'name': 'Новое название',
+                'recipe_products': [
+                    {'ingredient': self.ingredients[9], 'amount': 5}
+                ],
+            })
+        results, queries = self.get_list(self.users[1])
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(results[0]['name'], 'Новое название')
+        ingredients = results[0]['ingredients']
+        self.assertEqual(
+            [(item['id'], item['amount']) for item in ingredients],
+            [(self.ingredients[9].pk, 5)]
+        )
+
+
+class TokenCacheTest(FoodgramTestCase):
+    URL = '/api/users/me/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.org',
+            username='user',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password-123'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        for user_id in list(token_cache.user_keys):
+            token_cache.remove_user(user_id)
+
+    def get_me(self, key=None):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {key or self.token.key}'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.URL)
+        return response, [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "authtoken_token"' in query['sql']
+        ]
+
+    def save_user(self, **fields):
+        user = User.objects.get(pk=self.user.pk)
+        for name, value in fields.items():
+            setattr(user, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        return user
+
+    def test_hit_and_miss(self):
+        stats = token_cache.stats()
+        response, queries = self.get_me()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.get_me()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.user.pk)
+        self.assertEqual(queries, [])
+        self.assertEqual(token_cache.stats()['hits'], stats['hits'] + 1)
+        self.assertEqual(token_cache.stats()['misses'], stats['misses'] + 1)
+
+    def test_unknown_token_not_cached(self):
+        for _ in range(2):
+            response, queries = self.get_me('0' * 40)
+            self.assertEqual(
+                response.status_code, status.HTTP_401_UNAUTHORIZED
+            )
+            self.assertEqual(len(queries), 1)
+
+    def test_ttl(self):
+        with mock.patch('api.authentication.time.monotonic') as monotonic:
+            monotonic.return_value = 1000
+            self.get_me()
+            monotonic.return_value = 1000 + settings.TOKEN_CACHE_TTL - 1
+            self.assertEqual(self.get_me()[1], [])
+            monotonic.return_value = 1000 + settings.TOKEN_CACHE_TTL
+            self.assertEqual(len(self.get_me()[1]), 1)
+
+    def test_unrelated_saves_keep_cache(self):
+        self.get_me()
+        user = self.save_user(first_name='Новое имя')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=['last_login'])
+        self.assertEqual(self.get_me()[1], [])
+
+    def test_auth_changes_revoke(self):
+        for fields in (
+            {'password': 'changed'},
+            {'is_active': False},
+            {'is_active': True},
+        ):
+            with self.subTest(fields=fields):
+                self.get_me()
+                self.save_user(**fields)
+                self.assertEqual(len(self.get_me()[1]), 1)
+
+    def test_deleted_token_revoked(self):
+        self.get_me()
+        key = self.token.key
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        response, _ = self.get_me(key)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_shared_version_revokes_other_processes(self):
+        other = TokenCache()
+        token = Token.objects.select_related('user').get(pk=self.token.pk)
+        for shared, cached in ((None, True), ('default', False)):
+            with self.subTest(shared=shared), override_settings(
+                TOKEN_CACHE=shared
+            ):
+                other.set(
+                    token.key, token, other.generation,
+                    other.get_version(token.user_id)
+                )
+                token_cache.remove_user(token.user_id)
+                self.assertEqual(other.get(token.key) is not None, cached)
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from .async_views import async_read_view
 from .views import (
     IngredientViewSet,
     RecipeViewSet,
@@ -29,3 +31,46 @@ urlpatterns = [
          name='subscribe'),
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns[-1:-1] = [
+        path('tags/',
+             async_read_view(
+                 TagViewSet, {'get': 'list'}, basename='tag', detail=False
+             ),
+             name='tag-list'),
+        path('tags/<int:pk>/',
+             async_read_view(
+                 TagViewSet, {'get': 'retrieve'}, basename='tag', detail=True
+             ),
+             name='tag-detail'),
+        path('ingredients/',
+             async_read_view(
+                 IngredientViewSet, {'get': 'list'},
+                 basename='ingredient', detail=False
+             ),
+             name='ingredient-list'),
+        path('ingredients/<int:pk>/',
+             async_read_view(
+                 IngredientViewSet, {'get': 'retrieve'},
+                 basename='ingredient', detail=True
+             ),
+             name='ingredient-detail'),
+        path('recipes/',
+             async_read_view(
+                 RecipeViewSet, {'get': 'list', 'post': 'create'},
+                 basename='recipe', detail=False
+             ),
+             name='recipe-list'),
+        path('recipes/<int:pk>/',
+             async_read_view(
+                 RecipeViewSet,
+                 {
+                     'get': 'retrieve',
+                     'patch': 'partial_update',
+                     'delete': 'destroy'
+                 },
+                 basename='recipe', detail=True
+             ),
+             name='recipe-detail'),
+    ]
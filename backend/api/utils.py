@@ -1,23 +1,88 @@
+import csv
 from datetime import datetime
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
 
 from recipes.models import User
 
+CSV_HEADER = ('Продукт', 'Единица измерения', 'Количество')
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 11
+PDF_LINE_HEIGHT = 16
+PDF_MARGIN = 50
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+def get_recipes_limit(request):
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return max(limit, 0)
+
+
+def shopping_list_lines(user: User):
+    yield 'СПИСОК ПОКУПОК (от {})'.format(
+        datetime.now().strftime('%H:%M:%S %d.%m.%Y')
+    )
+    yield ''
+    yield 'Рецепты:'
+    for name in user.shopping_recipes.values_list(
+        'name', flat=True
+    ).iterator():
+        yield f'* {name}'
+    yield ''
+    yield 'Продукты:'
+    for index, product in enumerate(user.shopping_cart().iterator(), start=1):
+        yield (
+            f'{index}. {product["total_amount"]} '
+            f'{product["measurement_unit"]} - {product["name"]}'
+        )
+
+
+def stream_shopping_list_txt(user: User):
+    for line in shopping_list_lines(user):
+        yield f'{line}\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def stream_shopping_list_csv(user: User):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for product in user.shopping_cart().iterator():
+        yield writer.writerow((
+            product['name'],
+            product['measurement_unit'],
+            product['total_amount']
+        ))
+
 
-def create_shopping_list(user: User) -> str:
-    return '\n'.join([
-        'СПИСОК ПОКУПОК (от {})'.format(
-            datetime.now().strftime('%H:%M:%S %d.%m.%Y')
-        ),
-        '',
-        'Рецепты:',
-        *[f'* {recipe.name}' for recipe in user.shopping_recipes.all()],
-        '',
-        'Продукты:',
-        *[f'{index}. {line}' for index, line in enumerate(
-            [
-                f'{product.total_amount} {product.measurement_unit} - '
-                f'{product.name}'for product in user.shopping_cart()
-            ],
-            start=1
-        )]
-    ])
+def stream_shopping_list_pdf(user: User):
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+        )
+    buffer = BytesIO()
+    canvas = Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - PDF_MARGIN
+    canvas.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+    for line in shopping_list_lines(user):
+        if y < PDF_MARGIN:
+            canvas.showPage()
+            canvas.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        canvas.drawString(PDF_MARGIN, y, line)
+        y -= PDF_LINE_HEIGHT
+    canvas.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
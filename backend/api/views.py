@@ -1,28 +1,68 @@
-from django.http import FileResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Value,
+    prefetch_related_objects
+)
+from django.db.models.expressions import RawSQL
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewset
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from recipes.models import Ingredient, Recipe, Subscription, Tag, User
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCartItem,
+    Subscription,
+    Tag,
+    TimelineEntry,
+    User
+)
+from .cache import recipe_cache
+from .catalog import ingredient_catalog, tag_catalog
 from .filters import RecipeFilter
+from .pagination import (
+    CursorPaginationMixin,
+    FoodgramCursorPagination,
+    FoodgramPagination
+)
 from .permissions import IsAuthorOrReadOnly
+from .renderers import (
+    ShoppingListCSVRenderer,
+    ShoppingListPDFRenderer,
+    ShoppingListTextRenderer
+)
+from .search import ingredient_index, recipe_coverage_index
 from .serializers import (
     IngredientSerializer,
+    RecipeCoverageSerializer,
     RecipeReadSerializer,
     RecipeSerializer,
     TagSerializer,
     SubscribingSerializer
 )
-from .utils import create_shopping_list
+from .utils import get_recipes_limit
 
 RECIPE_NOT_IN_FAVORITE = 'Рецепт {} не добавлен в избранное.'
 RECIPE_IN_FAVORITE = 'Рецепт {} уже есть в избранном.'
@@ -31,6 +71,7 @@ RECIPE_IN_SHOPPING = 'Рецепт {} уже есть в списке покуп
 SUBSCRIPTION_NOT_FOUND = 'Вы не подписаны на пользователя {}'
 SUBSCRIBE_SELF = 'Нельзя подписаться на самого себя.'
 EXIST_IN_SUBSCRIBING = 'Вы уже подписаны на пользователя {}'
+INGREDIENTS_REQUIRED = 'Укажите id имеющихся продуктов через запятую.'
 
 
 class UserViewSet(DjoserUserViewset):
@@ -42,13 +83,45 @@ class UserViewSet(DjoserUserViewset):
         return super().get_permissions()
 
 
-class SubscriptionsListView(ListAPIView):
+class SubscriptionsListView(CursorPaginationMixin, ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = SubscribingSerializer
+    cursor_ordering = ('username',)
+
+    @staticmethod
+    def top_recipes_sql(author_ids, limit):
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return RawSQL(
+            'SELECT id FROM ('
+            'SELECT id, ROW_NUMBER() OVER ('
+            'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            ') AS row_number '
+            f'FROM {Recipe._meta.db_table} '
+            f'WHERE author_id IN ({placeholders})'
+            ') AS ranked WHERE row_number <= %s',
+            (*author_ids, limit)
+        )
 
     def get_queryset(self):
         return User.objects.filter(subscribers__user=self.request.user)
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if not page:
+            return page
+        recipes = Recipe.objects.defer('search_vector').order_by(
+            '-pub_date', '-id'
+        )
+        limit = get_recipes_limit(self.request)
+        if limit is not None:
+            recipes = recipes.filter(pk__in=self.top_recipes_sql(
+                [author.pk for author in page], limit
+            ))
+        prefetch_related_objects(page, Prefetch(
+            'recipes', queryset=recipes, to_attr='preview_recipes'
+        ))
+        return page
+
 
 class SubscribeView(APIView):
     permission_classes = [IsAuthenticated]
@@ -77,53 +150,132 @@ class SubscribeView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class CatalogViewSet(ReadOnlyModelViewSet):
+    pagination_class = None
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        etag, body = self.catalog.get()
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags or '*' in etags:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+
+class TagViewSet(CatalogViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    pagination_class = None
+    catalog = tag_catalog
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    pagination_class = None
-    filter_backends = [SearchFilter]
-    search_fields = ['^name']
+    catalog = ingredient_catalog
+    search_param = api_settings.SEARCH_PARAM
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(
+            query, settings.INGREDIENT_SEARCH_LIMIT
+        ))
 
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.prefetch_related(
-        'ingredients', 'tags', 'author'
-    )
+class RecipeViewSet(CursorPaginationMixin, ModelViewSet):
+    queryset = Recipe.objects.select_related('author').defer('search_vector')
     http_method_names = ['get', 'post', 'patch', 'delete']
     serializer_class = RecipeSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     permission_classes = [IsAuthorOrReadOnly]
+    cursor_excluded_params = ('search',)
 
     def get_permissions(self):
         if self.action in [
-            'favorite', 'shopping_cart', 'download_shopping_cart'
+            'favorite', 'shopping_cart', 'download_shopping_cart', 'feed'
         ]:
             return [IsAuthenticated()]
         return super().get_permissions()
 
+    def get_queryset(self):
+        recipes = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return recipes.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return recipes.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(recipe=OuterRef('pk'), user=user)
+            ),
+            is_in_shopping_cart=Exists(ShoppingCartItem.objects.filter(
+                recipe=OuterRef('pk'), user=user
+            ))
+        )
+
     def perform_create(self, serializer):
         return serializer.save(author=self.request.user)
 
+    def get_cached_response(self, request, scopes, view, *args, **kwargs):
+        if (
+            recipe_cache.cache is None
+            or request.user.is_authenticated
+            or request.accepted_renderer.format != 'json'
+        ):
+            return view(request, *args, **kwargs)
+        key = recipe_cache.get_key(request, *scopes)
+        cached = recipe_cache.get(key)
+        if cached is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            response = self.finalize_response(
+                request, response, *args, **kwargs
+            )
+            cached = (response.rendered_content, response['Content-Type'])
+            recipe_cache.set(key, cached)
+        return HttpResponse(cached[0], content_type=cached[1])
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, ['catalog', 'list'], super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        if not pk.isdigit() or pk != str(int(pk)):
+            return super().retrieve(request, *args, **kwargs)
+        return self.get_cached_response(
+            request,
+            ['catalog', f'recipe:{pk}'],
+            super().retrieve,
+            *args,
+            **kwargs
+        )
+
     @staticmethod
-    def add_favorited_or_shopped_by(request, recipe, recipe_set, message):
-        if request.user in recipe_set.all():
+    def add_favorited_or_shopped_by(request, recipe, model, message):
+        try:
+            with transaction.atomic():
+                model.objects.create(user=request.user, recipe=recipe)
+        except IntegrityError:
             raise ValidationError({'errors': message})
-        recipe_set.add(request.user)
         return Response(RecipeReadSerializer(recipe).data,
                         status=status.HTTP_201_CREATED)
 
     @staticmethod
-    def remove_favorited_or_shopped_by(request, object_set, message):
-        if request.user not in object_set.all():
+    def remove_favorited_or_shopped_by(request, recipe, model, message):
+        deleted, _ = model.objects.filter(
+            user=request.user, recipe=recipe
+        ).delete()
+        if not deleted:
             raise ValidationError({'errors': message})
-        object_set.remove(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(['post', 'delete'], detail=True)
@@ -131,12 +283,12 @@ class RecipeViewSet(ModelViewSet):
         recipe = self.get_object()
         if request.method == 'POST':
             return self.add_favorited_or_shopped_by(
-                request, recipe, recipe.favorited_by,
+                request, recipe, Favorite,
                 RECIPE_IN_FAVORITE.format(recipe.name)
             )
         elif request.method == 'DELETE':
             return self.remove_favorited_or_shopped_by(
-                request, recipe.favorited_by,
+                request, recipe, Favorite,
                 RECIPE_NOT_IN_FAVORITE.format(recipe.name)
             )
 
@@ -145,19 +297,93 @@ class RecipeViewSet(ModelViewSet):
         recipe = self.get_object()
         if request.method == 'POST':
             return self.add_favorited_or_shopped_by(
-                request, recipe, recipe.shopped_by,
+                request, recipe, ShoppingCartItem,
                 RECIPE_IN_SHOPPING.format(recipe.name)
             )
         elif request.method == 'DELETE':
             return self.remove_favorited_or_shopped_by(
-                request, recipe.shopped_by,
+                request, recipe, ShoppingCartItem,
                 RECIPE_NOT_IN_SHOPPING.format(recipe.name)
             )
 
     @action(['get'], detail=False)
+    def feed(self, request):
+        paginator = FoodgramCursorPagination()
+        paginator.ordering = ('-pub_date', '-recipe_id')
+        entries = paginator.paginate_queryset(
+            TimelineEntry.objects.filter(user=request.user).values(
+                'recipe_id', 'pub_date'
+            ),
+            request,
+            view=self
+        )
+        recipe_ids = [entry['recipe_id'] for entry in entries]
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        return paginator.get_paginated_response(self.get_serializer(
+            [recipes[id] for id in recipe_ids if id in recipes], many=True
+        ).data)
+
+    @staticmethod
+    def get_ingredient_ids(request):
+        try:
+            ids = {
+                int(id)
+                for value in request.query_params.getlist('ingredients')
+                for id in value.split(',') if id.strip()
+            }
+        except ValueError:
+            ids = None
+        if not ids:
+            raise ValidationError({'ingredients': INGREDIENTS_REQUIRED})
+        return ids
+
+    @action(['get'], detail=False)
+    def by_ingredients(self, request):
+        paginator = FoodgramPagination()
+        ranked = paginator.paginate_queryset(
+            recipe_coverage_index.rank(self.get_ingredient_ids(request)),
+            request,
+            view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, _, recipe_id in ranked]
+        )
+        page = []
+        for coverage, matched_count, recipe_id in ranked:
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.coverage = coverage
+                recipe.matched_count = matched_count
+                page.append(recipe)
+        return paginator.get_paginated_response(RecipeCoverageSerializer(
+            page, many=True, context=self.get_serializer_context()
+        ).data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.action == 'download_shopping_cart' and getattr(
+            response, 'exception', False
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    @action(['get'], detail=False, renderer_classes=[
+        ShoppingListTextRenderer,
+        ShoppingListCSVRenderer,
+        ShoppingListPDFRenderer,
+        JSONRenderer
+    ])
     def download_shopping_cart(self, request):
-        return FileResponse(
-            create_shopping_list(request.user),
-            filename='shopping_list.txt',
-            as_attachment=True
+        renderer = request.accepted_renderer
+        if not hasattr(renderer, 'stream'):
+            renderer = ShoppingListTextRenderer()
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(request.user), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
+        return response
@@ -0,0 +1,21 @@
+import os
+import time
+
+from django.db.backends.signals import connection_created
+
+from .settings import *  # noqa: F401,F403
+
+DB_SIMULATED_LATENCY = float(os.getenv('DB_SIMULATED_LATENCY', 5))
+
+
+def simulate_latency(execute, sql, params, many, context):
+    time.sleep(DB_SIMULATED_LATENCY / 1000)
+    return execute(sql, params, many, context)
+
+
+def install_latency(sender, connection, **kwargs):
+    if simulate_latency not in connection.execute_wrappers:
+        connection.execute_wrappers.append(simulate_latency)
+
+
+connection_created.connect(install_latency)
@@ -39,6 +39,24 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+SQL_PROFILING = bool(os.getenv('SQL_PROFILING'))
+
+SQL_PROFILING_REPEAT_LIMIT = int(os.getenv('SQL_PROFILING_REPEAT_LIMIT', 5))
+
+if SQL_PROFILING:
+    MIDDLEWARE.insert(0, 'api.middleware.SQLProfilingMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.sql': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 ROOT_URLCONF = 'foodgram_backend.urls'
 
 TEMPLATES = [
@@ -74,10 +92,29 @@ else:
             'USER': os.getenv('POSTGRES_USER', 'foodgram'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'DISABLE_SERVER_SIDE_CURSORS': bool(os.getenv('DB_PGBOUNCER')),
         }
     }
 
+DB_CONN_HEALTH_CHECKS = os.getenv(
+    'DB_CONN_HEALTH_CHECKS', 'True'
+).lower() in ('1', 'true', 'yes')
+
+ASYNC_READ_VIEWS = bool(os.getenv('ASYNC_READ_VIEWS'))
+
+ASYNC_READ_THREADS = int(os.getenv('ASYNC_READ_THREADS', 8))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_USER_MODEL = 'recipes.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -101,7 +138,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachingTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.FoodgramPagination',
@@ -110,6 +147,34 @@ REST_FRAMEWORK = {
 
 }
 
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1000))
+
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+
+TOKEN_CACHE = os.getenv('TOKEN_CACHE')
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+
+INGREDIENT_SEARCH_TTL = int(os.getenv('INGREDIENT_SEARCH_TTL', 300))
+
+RECIPE_COVERAGE_TTL = int(os.getenv('RECIPE_COVERAGE_TTL', 300))
+
+CATALOG_CACHE = os.getenv('CATALOG_CACHE')
+
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 300))
+
+RECIPE_CACHE = os.getenv('RECIPE_CACHE')
+
+RECIPE_CACHE_TTL = int(os.getenv('RECIPE_CACHE_TTL', 300))
+
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+TIMELINE_SIZE = int(os.getenv('TIMELINE_SIZE', 500))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SERIALIZERS': {
@@ -1,12 +1,21 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.contrib.auth.models import Group
-from django.db.models import Count
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
 from .filters import CookingTimeListFilter, SubscriptionListFilter
-from .models import Ingredient, RecipeProduct, Recipe, Subscription, Tag, User
+from .models import (
+    Favorite,
+    Ingredient,
+    RecipeProduct,
+    Recipe,
+    ShoppingCartItem,
+    Subscription,
+    Tag,
+    User
+)
+from .search import update_search_index
 
 
 class IngredientInline(admin.TabularInline):
@@ -30,26 +39,6 @@ class UserAdmin(DjangoUserAdmin):
         'subscribers_count'
     )
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(
-            recipes_count=Count('recipes', distinct=True),
-            subscribed_to_count=Count('subscribed_to', distinct=True),
-            subscribers_count=Count('subscribers', distinct=True),
-        )
-
-    @admin.display(description='Рецепты', ordering='recipes_count')
-    def recipes_count(self, user):
-        return user.recipes_count
-
-    @admin.display(description='Подписки', ordering='subscribed_to_count')
-    def subscribed_to_count(self, user):
-        return user.subscribed_to_count
-
-    @admin.display(description='Подписчики', ordering='subscribers_count')
-    def subscribers_count(self, user):
-        return user.subscribers_count
-
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
@@ -57,7 +46,7 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author_link',
-        'favorited_count',
+        'favorites_count',
         'cooking_time',
         'image_tag',
         'tags_display',
@@ -66,17 +55,6 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('author__username', 'tags__name', CookingTimeListFilter)
     search_fields = ['tags__name', 'name', 'author__username']
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(
-            favorited_count=Count('favorited_by', distinct=True),
-        )
-
-    @admin.display(description='Добавлено в избранное',
-                   ordering='favorited_count')
-    def favorited_count(self, recipe):
-        return recipe.favorited_count
-
     @admin.display(description='Автор', ordering='author__username')
     @mark_safe
     def author_link(self, recipe):
@@ -106,6 +84,13 @@ class RecipeAdmin(admin.ModelAdmin):
             for product in recipe.recipe_products.all()
         )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('search_vector')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_search_index([form.instance.pk])
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -113,17 +98,6 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ['measurement_unit']
     search_fields = ['name']
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(
-            recipes_count=Count('recipes', distinct=True),
-        )
-
-    @admin.display(description='Количество рецептов',
-                   ordering='recipes_count')
-    def recipes_count(self, ingredient):
-        return ingredient.recipes_count
-
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -135,17 +109,6 @@ class TagAdmin(admin.ModelAdmin):
         'recipes_count'
     )
 
-    def get_queryset(self, request):
-        tags = super().get_queryset(request)
-        return tags.annotate(
-            recipes_count=Count('recipes', distinct=True),
-        )
-
-    @admin.display(description='Сколько раз применен',
-                   ordering='recipes_count')
-    def recipes_count(self, tag):
-        return tag.recipes_count
-
     @admin.display(description='Цвет', ordering='color')
     @mark_safe
     def color_display(self, tag: Tag):
@@ -159,6 +122,12 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('user', 'subscribing')
 
 
+@admin.register(Favorite, ShoppingCartItem)
+class UserRecipeAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipe', 'created_at')
+    list_select_related = ('user', 'recipe')
+
+
 admin.site.unregister(Group)
 admin.site.site_header = 'Портал администратора Foodgram'
 admin.site.site_title = 'Портал администратора Foodgram'
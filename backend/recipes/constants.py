@@ -11,3 +11,6 @@ MAX_RECIPE_NAME = 200
 MAX_INGREDIENT_NAME = 200
 MAX_INGREDIENT_MEASURE = 200
 INVALID_USERNAMES = ['me']
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+RECIPE_IMAGE_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+RECIPE_IMAGE_QUALITY = 80
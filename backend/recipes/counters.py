@@ -0,0 +1,74 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeProduct,
+    Subscription,
+    Tag,
+    User
+)
+
+COUNTERS = [
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribed_to_count', Subscription, 'user'),
+    (User, 'subscribers_count', Subscription, 'subscribing'),
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Ingredient, 'recipes_count', RecipeProduct, 'ingredient'),
+    (Tag, 'recipes_count', Recipe.tags.through, 'tag'),
+]
+
+pending_changes = ContextVar('pending_changes', default=None)
+
+
+def change_counter(model, pks, field, delta=1):
+    pending = pending_changes.get()
+    if pending is not None:
+        for pk in pks:
+            pending[model, field][pk] += delta
+        return None
+    objects = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        objects = objects.filter(**{f'{field}__gte': -delta})
+    return objects.update(**{field: F(field) + delta})
+
+
+@contextmanager
+def batched_counters():
+    pending = defaultdict(Counter)
+    token = pending_changes.set(pending)
+    try:
+        yield
+    finally:
+        pending_changes.reset(token)
+    for (model, field), deltas in pending.items():
+        pks_by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            if delta:
+                pks_by_delta[delta].append(pk)
+        for delta, pks in pks_by_delta.items():
+            change_counter(model, pks, field, delta)
+
+
+def actual_count(related_model, related_field):
+    return Coalesce(Subquery(
+        related_model.objects.filter(
+            **{related_field: OuterRef('pk')}
+        ).order_by().values(related_field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def recount(model, field, related_model, related_field):
+    return model.objects.annotate(
+        actual_count=actual_count(related_model, related_field)
+    ).exclude(**{field: F('actual_count')}).update(
+        **{field: actual_count(related_model, related_field)}
+    )
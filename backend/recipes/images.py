@@ -0,0 +1,81 @@
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .constants import (
+    RECIPE_IMAGE_FORMATS,
+    RECIPE_IMAGE_QUALITY,
+    RECIPE_IMAGE_WIDTHS
+)
+from . import signals
+from .models import Recipe
+
+RENDITIONS_DIR = 'recipes/renditions/'
+
+logger = logging.getLogger(__name__)
+
+
+def get_widths(image_width):
+    widths = [width for width in RECIPE_IMAGE_WIDTHS if width < image_width]
+    return widths + [min(image_width, RECIPE_IMAGE_WIDTHS[-1])]
+
+
+def render_image(image, width, image_format):
+    if width < image.width:
+        image = image.resize(
+            (width, round(image.height * width / image.width)),
+            Image.LANCZOS
+        )
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=RECIPE_IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def delete_renditions(renditions):
+    for names in renditions.values():
+        for name in names.values():
+            default_storage.delete(name)
+
+
+def create_renditions(recipe):
+    with recipe.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    image = image.convert('RGB')
+    widths = get_widths(image.width)
+    return {
+        extension: {
+            str(width): default_storage.save(
+                f'{RENDITIONS_DIR}{recipe.pk}_{width}.{extension}',
+                render_image(image, width, image_format)
+            )
+            for width in widths
+        }
+        for extension, image_format in RECIPE_IMAGE_FORMATS.items()
+    }
+
+
+def process_recipe_image(recipe):
+    delete_renditions(recipe.image_renditions)
+    try:
+        renditions = create_renditions(recipe)
+    except (OSError, UnidentifiedImageError, ValueError) as error:
+        logger.warning(
+            'Cannot process image of recipe %s: %s', recipe.pk, error
+        )
+        renditions = {}
+    updated = Recipe.objects.filter(
+        pk=recipe.pk, image=recipe.image.name
+    ).update(
+        image_renditions=renditions,
+        image_processed=True,
+        image_claimed_at=None
+    )
+    if not updated:
+        delete_renditions(renditions)
+    else:
+        signals.recipe_image_processed.send(sender=Recipe, instance=recipe)
+    return renditions
@@ -0,0 +1,194 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.constants import MAX_RECIPE_NAME
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeProduct,
+    ShoppingCartItem,
+    Subscription,
+    Tag,
+    User
+)
+from recipes.timeline import backfill_timeline
+
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+DATA_DIR = settings.BASE_DIR / 'data'
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic dataset for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Subscriptions per user'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20, help='Favorites per user'
+        )
+        parser.add_argument(
+            '--cart', type=int, default=10,
+            help='Shopping cart entries per user'
+        )
+        parser.add_argument(
+            '--products', type=int, default=8,
+            help='Maximum ingredients per recipe'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete previously generated users and their recipes'
+        )
+
+    def load_catalogs(self):
+        if not Ingredient.objects.exists():
+            call_command(
+                'load_ingredients', str(DATA_DIR / 'ingredients.json'),
+                stdout=self.stdout
+            )
+        if not Tag.objects.exists():
+            call_command(
+                'load_tags', str(DATA_DIR / 'tags.json'), stdout=self.stdout
+            )
+        return (
+            list(Ingredient.objects.values_list('id', 'name')),
+            list(Tag.objects.values_list('id', flat=True))
+        )
+
+    def create_users(self, count, batch_size):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{USERNAME_PREFIX}{index}',
+                    email=f'{USERNAME_PREFIX}{index}@example.org',
+                    first_name='Пользователь',
+                    last_name=str(index),
+                    password=password
+                )
+                for index in range(count)
+            ),
+            batch_size=batch_size
+        )
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, rng, options, user_ids, ingredients, tag_ids):
+        products = [
+            rng.sample(ingredients, rng.randint(1, options['products']))
+            for _ in range(options['recipes'])
+        ]
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=rng.choice(user_ids),
+                    name='{} ({})'.format(
+                        ', '.join(name for _, name in chosen[:2]), index
+                    ).capitalize()[:MAX_RECIPE_NAME],
+                    text='Приготовить из продуктов: {}.'.format(
+                        ', '.join(name for _, name in chosen)
+                    ),
+                    image='recipes/images/bench.png',
+                    cooking_time=rng.randint(1, 180)
+                )
+                for index, chosen in enumerate(products)
+            ),
+            batch_size=options['batch_size']
+        )
+        recipe_ids = list(Recipe.objects.filter(
+            author_id__in=user_ids
+        ).order_by('id').values_list('id', flat=True))
+        RecipeProduct.objects.bulk_create(
+            (
+                RecipeProduct(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                )
+                for recipe_id, chosen in zip(recipe_ids, products)
+                for ingredient_id, _ in chosen
+            ),
+            batch_size=options['batch_size']
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(
+                    tag_ids, rng.randint(1, len(tag_ids))
+                )
+            ),
+            batch_size=options['batch_size']
+        )
+        return recipe_ids
+
+    @staticmethod
+    def create_user_links(rng, model, field, user_ids, targets, count,
+                          batch_size):
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, **{f'{field}_id': target})
+                for user_id in user_ids
+                for target in [
+                    target for target in rng.sample(
+                        targets, min(count + 1, len(targets))
+                    )
+                    if model is not Subscription or target != user_id
+                ][:count]
+            ),
+            batch_size=batch_size
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        started = time.monotonic()
+        generated = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        with transaction.atomic():
+            if options['clear']:
+                generated.delete()
+            elif generated.exists():
+                raise CommandError(
+                    'Generated data already exists, use --clear to replace it.'
+                )
+            ingredients, tag_ids = self.load_catalogs()
+            user_ids = self.create_users(
+                options['users'], options['batch_size']
+            )
+            recipe_ids = self.create_recipes(
+                rng, options, user_ids, ingredients, tag_ids
+            )
+            for model, field, targets, count in [
+                (Subscription, 'subscribing', user_ids,
+                 options['subscriptions']),
+                (Favorite, 'recipe', recipe_ids, options['favorites']),
+                (ShoppingCartItem, 'recipe', recipe_ids, options['cart']),
+            ]:
+                self.create_user_links(
+                    rng, model, field, user_ids, targets, count,
+                    options['batch_size']
+                )
+            for subscription in Subscription.objects.filter(
+                user_id__in=user_ids
+            ).iterator():
+                backfill_timeline(subscription)
+            call_command('recount', stdout=self.stdout)
+            call_command('update_search_index', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(user_ids)} users and {len(recipe_ids)} recipes '
+            f'in {time.monotonic() - started:.1f} s. '
+            f'Password of every user: {PASSWORD}'
+        ))
@@ -1,28 +1,207 @@
+import csv
 import json
+import time
+from itertools import islice
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
 from recipes.models import Ingredient
+from recipes.signals import catalog_imported
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    for chunk in iter(lambda: file.read(JSON_CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('JSON file must contain an array.')
+                started = True
+                position += 1
+                continue
+            if position >= len(buffer) or buffer[position] == ']':
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+    if buffer[position:].strip() not in ('', ']'):
+        raise CommandError('Invalid JSON at the end of file.')
 
 
 class Command(BaseCommand):
-    help = 'Load ingredients from json into database'
+    help = 'Load ingredients from json or csv into database'
+    model = Ingredient
+    fields = ('name', 'measurement_unit')
+    key_fields = ('name', 'measurement_unit')
 
     def add_arguments(self, parser):
         parser.add_argument('filename', type=str)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        if self.update_fields:
+            parser.add_argument(
+                '--upsert', action='store_true',
+                help='Update existing rows matched by natural key'
+            )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Show changes without writing to database'
+        )
 
     @staticmethod
     def check_filename(filename):
-        if not filename.endswith('.json'):
-            raise CommandError('Uknown file format. Only .json is supported.')
+        if not filename.endswith(('.json', '.csv')):
+            raise CommandError(
+                'Uknown file format. Only .json and .csv are supported.'
+            )
         return filename
 
+    @property
+    def update_fields(self):
+        return [
+            field for field in self.fields if field not in self.key_fields
+        ]
+
+    @property
+    def unique_fields(self):
+        return [
+            field.name for field in self.model._meta.fields
+            if field.unique and field.name in self.update_fields
+        ]
+
+    def get_taken(self, batch):
+        return {
+            field: dict(self.model.objects.filter(**{
+                f'{field}__in': {data[field] for data in batch.values()}
+            }).values_list(field, 'pk'))
+            for field in self.unique_fields
+        }
+
+    def get_conflict(self, data, obj, taken, claimed):
+        pk = obj.pk if obj is not None else None
+        key = self.get_key(data)
+        for field in self.unique_fields:
+            value = data[field]
+            if taken[field].get(value, pk) != pk or (
+                claimed[field].get(value, key) != key
+            ):
+                return field
+        return None
+
+    def read_rows(self, file, filename):
+        if filename.endswith('.csv'):
+            for line, row in enumerate(csv.reader(file), start=1):
+                if len(row) != len(self.fields):
+                    raise CommandError(f'Invalid row at line {line}: {row}')
+                yield dict(zip(self.fields, row))
+        else:
+            for data in iter_json_array(file):
+                if not isinstance(data, dict) or set(self.fields) - set(data):
+                    raise CommandError(f'Invalid object: {data}')
+                yield {field: data[field] for field in self.fields}
+
+    def get_key(self, data):
+        return tuple(data[field] for field in self.key_fields)
+
+    def get_object_key(self, obj):
+        return tuple(getattr(obj, field) for field in self.key_fields)
+
+    def get_existing(self, batch):
+        lookup = self.key_fields[0]
+        return {
+            self.get_object_key(obj): obj
+            for obj in self.model.objects.filter(**{
+                f'{lookup}__in': {data[lookup] for data in batch.values()}
+            })
+        }
+
+    def process_batch(self, batch, options, stats, claimed):
+        existing = self.get_existing(batch)
+        taken = self.get_taken(batch)
+        to_create, to_update = [], []
+        for key, data in batch.items():
+            obj = existing.get(key)
+            if obj is None or options.get('upsert'):
+                field = self.get_conflict(data, obj, taken, claimed)
+                if field is not None:
+                    stats['skipped'] += 1
+                    self.stderr.write(
+                        f'Skipped {data}: {field} "{data[field]}" '
+                        'is already used.'
+                    )
+                    continue
+                for field in self.unique_fields:
+                    claimed[field][data[field]] = key
+            if obj is None:
+                to_create.append(self.model(**data))
+                if options['dry_run']:
+                    self.stdout.write(f'+ {data}')
+                continue
+            changes = {
+                field: (getattr(obj, field), data[field])
+                for field in self.update_fields
+                if getattr(obj, field) != data[field]
+            }
+            if not options.get('upsert') or not changes:
+                stats['unchanged'] += 1
+                continue
+            for field, (_, value) in changes.items():
+                setattr(obj, field, value)
+            to_update.append(obj)
+            if options['dry_run']:
+                self.stdout.write(f'~ {key}: {changes}')
+        stats['created'] += len(to_create)
+        stats['updated'] += len(to_update)
+        if options['dry_run']:
+            return
+        self.model.objects.bulk_create(to_create)
+        if to_update:
+            self.model.objects.bulk_update(to_update, self.update_fields)
+            stats['updated_pks'].extend(obj.pk for obj in to_update)
+
     def handle(self, *args, **options):
         filename = self.check_filename(options['filename'])
-        with open(filename, encoding='utf-8') as file:
-            ingredients = Ingredient.objects.bulk_create(
-                [Ingredient(**data) for data in json.load(file)]
-            )
+        stats = {
+            'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0,
+            'skipped': 0, 'updated_pks': []
+        }
+        claimed = {field: {} for field in self.unique_fields}
+        started = time.monotonic()
+        with open(filename, encoding='utf-8') as file, transaction.atomic():
+            rows = self.read_rows(file, filename)
+            while True:
+                batch = {}
+                for data in islice(rows, options['batch_size']):
+                    batch[self.get_key(data)] = data
+                    stats['rows'] += 1
+                if not batch:
+                    break
+                self.process_batch(batch, options, stats, claimed)
+            if not options['dry_run'] and (
+                stats['created'] or stats['updated']
+            ):
+                catalog_imported.send(
+                    sender=self.model, updated_pks=stats['updated_pks']
+                )
+        elapsed = time.monotonic() - started
         self.stdout.write(self.style.SUCCESS(
-            f'Successfully loaded {len(ingredients)} ingredients'
+            '{prefix}{rows} rows of {name}: {created} created, '
+            '{updated} updated, {unchanged} unchanged, {skipped} skipped '
+            '({speed:.0f} rows/sec)'.format(
+                prefix='Dry run. ' if options['dry_run'] else '',
+                name=self.model._meta.verbose_name_plural.lower(),
+                speed=stats['rows'] / elapsed if elapsed else 0,
+                **stats
+            )
         ))
@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Create resized renditions of uploaded recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new images instead of exiting'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=2,
+            help='Seconds to wait between polls in --loop mode'
+        )
+        parser.add_argument(
+            '--claim-timeout', type=float, default=600,
+            help='Seconds after which images claimed by a stopped worker '
+                 'are processed again'
+        )
+
+    @staticmethod
+    def claim_batch(batch_size, claim_timeout):
+        now = timezone.now()
+        with transaction.atomic():
+            recipes = list(
+                Recipe.objects.filter(
+                    Q(image_claimed_at__isnull=True)
+                    | Q(image_claimed_at__lt=now - timedelta(
+                        seconds=claim_timeout
+                    )),
+                    image_processed=False
+                ).only(
+                    'id', 'image', 'image_renditions'
+                ).order_by('pk').select_for_update(
+                    skip_locked=True
+                )[:batch_size]
+            )
+            Recipe.objects.filter(
+                pk__in=[recipe.pk for recipe in recipes]
+            ).update(image_claimed_at=now)
+        return recipes
+
+    def process_batch(self, batch_size, claim_timeout):
+        recipes = self.claim_batch(batch_size, claim_timeout)
+        for recipe in recipes:
+            process_recipe_image(recipe)
+        return len(recipes)
+
+    def handle(self, *args, **options):
+        while True:
+            processed = self.process_batch(
+                options['batch_size'], options['claim_timeout']
+            )
+            if processed:
+                self.stdout.write(f'Processed {processed} images')
+            elif not options['loop']:
+                break
+            else:
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('No images left to process.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = 'Recalculate denormalized counters and repair drift'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, field, related_model, related_field in COUNTERS:
+                repaired = recount(model, field, related_model, related_field)
+                self.stdout.write(
+                    f'{model.__name__}.{field}: repaired {repaired} rows'
+                )
+        self.stdout.write(self.style.SUCCESS('Counters are up to date.'))
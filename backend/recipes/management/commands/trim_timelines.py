@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.timeline import trim_timelines
+
+
+class Command(BaseCommand):
+    help = 'Trim recipe timelines to the TIMELINE_SIZE newest entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep trimming periodically instead of exiting'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300,
+            help='Seconds to wait between runs in --loop mode'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = trim_timelines()
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {deleted} entries, '
+                f'timelines keep {settings.TIMELINE_SIZE} newest recipes.'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,120 @@
+# Generated by Django 3.2.16 on 2026-10-17 09:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_user_recipes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for field_name, model_name in [
+        ('favorited_by', 'Favorite'),
+        ('shopped_by', 'ShoppingCartItem'),
+    ]:
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        model = apps.get_model('recipes', model_name)
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id, recipe_id in through.objects.values_list(
+                    'user_id', 'recipe_id'
+                ).iterator()
+            ),
+            batch_size=1000
+        )
+
+
+def copy_user_recipes_back(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for field_name, model_name in [
+        ('favorited_by', 'Favorite'),
+        ('shopped_by', 'ShoppingCartItem'),
+    ]:
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        model = apps.get_model('recipes', model_name)
+        through.objects.bulk_create(
+            (
+                through(user_id=user_id, recipe_id=recipe_id)
+                for user_id, recipe_id in model.objects.values_list(
+                    'user_id', 'recipe_id'
+                ).iterator()
+            ),
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в списке покупок',
+                'verbose_name_plural': 'рецепты в списке покупок',
+                'ordering': ('-created_at',),
+                'abstract': False,
+                'default_related_name': 'shopping_cart_items',
+            },
+        ),
+        migrations.CreateModel(
+            name='Favorite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Избранное',
+                'verbose_name_plural': 'избранное',
+                'ordering': ('-created_at',),
+                'abstract': False,
+                'default_related_name': 'favorites',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcartitem',
+            index=models.Index(fields=['user', 'created_at'], name='shoppingcartitem_user_created'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shoppingcartitem'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'created_at'], name='favorite_user_created'),
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite'),
+        ),
+        migrations.RunPython(copy_user_recipes, copy_user_recipes_back),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='favorited_by',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='shopped_by',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorited_by',
+            field=models.ManyToManyField(blank=True, related_name='favorite_recipes', through='recipes.Favorite', to=settings.AUTH_USER_MODEL, verbose_name='Добавили в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopped_by',
+            field=models.ManyToManyField(blank=True, related_name='shopping_recipes', through='recipes.ShoppingCartItem', to=settings.AUTH_USER_MODEL, verbose_name='Добавили в покупки'),
+        ),
+    ]
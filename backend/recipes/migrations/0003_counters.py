@@ -0,0 +1,72 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for model_name, field, related_model, related_field in [
+        ('User', 'recipes_count', Recipe, 'author'),
+        ('User', 'subscribed_to_count',
+         apps.get_model('recipes', 'Subscription'), 'user'),
+        ('User', 'subscribers_count',
+         apps.get_model('recipes', 'Subscription'), 'subscribing'),
+        ('Recipe', 'favorites_count',
+         apps.get_model('recipes', 'Favorite'), 'recipe'),
+        ('Ingredient', 'recipes_count',
+         apps.get_model('recipes', 'RecipeProduct'), 'ingredient'),
+        ('Tag', 'recipes_count',
+         Recipe._meta.get_field('tags').remote_field.through, 'tag'),
+    ]:
+        apps.get_model('recipes', model_name).objects.update(**{
+            field: Coalesce(Subquery(
+                related_model.objects.filter(
+                    **{related_field: OuterRef('pk')}
+                ).order_by().values(related_field).annotate(
+                    count=Count('pk')
+                ).values('count')
+            ), 0)
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_favorite_shoppingcartitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлено в избранное'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сколько раз применен'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецепты'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribed_to_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписки'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчики'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
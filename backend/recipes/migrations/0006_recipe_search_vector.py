@@ -0,0 +1,70 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:36
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+GIN_INDEX = 'recipes_recipe_search_vector_gin'
+INGREDIENT_NAMES_SQL = (
+    'COALESCE((SELECT {aggregate}(ingredient.name, \' \') '
+    'FROM recipes_recipeproduct AS product '
+    'JOIN recipes_ingredient AS ingredient '
+    'ON ingredient.id = product.ingredient_id '
+    'WHERE product.recipe_id = recipe.id), \'\')'
+)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {GIN_INDEX} '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            'UPDATE recipes_recipe AS recipe SET search_vector = '
+            'setweight(to_tsvector(%s::regconfig, recipe.name), \'A\') || '
+            'setweight(to_tsvector(%s::regconfig, {names}), \'B\') || '
+            'setweight(to_tsvector(%s::regconfig, recipe.text), \'C\')'.format(
+                names=INGREDIENT_NAMES_SQL.format(aggregate='string_agg')
+            ),
+            [SEARCH_CONFIG] * 3
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            'USING fts5(name, ingredients, text, '
+            'tokenize = "unicode61 remove_diacritics 2")'
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+            'SELECT recipe.id, recipe.name, {names}, recipe.text '
+            'FROM recipes_recipe AS recipe'.format(
+                names=INGREDIENT_NAMES_SQL.format(aggregate='group_concat')
+            )
+        )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -17,6 +18,15 @@ class User(AbstractUser):
     first_name = models.CharField('Имя', max_length=constants.MAX_FIRST_NAME)
     last_name = models.CharField('Фамилия', max_length=constants.MAX_LAST_NAME)
     email = models.EmailField(unique=True, max_length=constants.MAX_EMAIL)
+    recipes_count = models.PositiveIntegerField(
+        'Рецепты', default=0, editable=False
+    )
+    subscribed_to_count = models.PositiveIntegerField(
+        'Подписки', default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Подписчики', default=0, editable=False
+    )
 
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     USERNAME_FIELD = 'email'
@@ -26,6 +36,17 @@ class User(AbstractUser):
         verbose_name_plural = 'пользователи'
         ordering = ('username',)
 
+    auth_fields = ('password', 'is_active')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user.auth_values = user.get_auth_values()
+        return user
+
+    def get_auth_values(self):
+        return tuple(self.__dict__.get(field) for field in self.auth_fields)
+
     def __repr__(self):
         return (
             f'<{type(self).__name__} '
@@ -40,9 +61,14 @@ class User(AbstractUser):
         return f'{self.username:.50}'
 
     def shopping_cart(self):
-        return Ingredient.objects.filter(
-            recipes__shopped_by=self
-        ).annotate(total_amount=models.Sum('recipe_products__amount'))
+        return RecipeProduct.objects.filter(
+            recipe__shopping_cart_items__user=self
+        ).values(
+            name=models.F('ingredient__name'),
+            measurement_unit=models.F('ingredient__measurement_unit')
+        ).annotate(
+            total_amount=models.Sum('amount')
+        ).order_by('name', 'measurement_unit')
 
 
 class Subscription(models.Model):
@@ -88,6 +114,9 @@ class Tag(models.Model):
     slug = models.SlugField(
         'Слаг', unique=True, max_length=constants.MAX_TAG_SLUG
     )
+    recipes_count = models.PositiveIntegerField(
+        'Сколько раз применен', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -113,6 +142,9 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         'Единица измерения', max_length=constants.MAX_INGREDIENT_MEASURE
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'Продукт'
@@ -136,6 +168,15 @@ class Recipe(models.Model):
     )
     name = models.CharField('Название', max_length=constants.MAX_RECIPE_NAME)
     image = models.ImageField('Картинка', upload_to='recipes/images/')
+    image_renditions = models.JSONField(
+        'Версии картинки', default=dict, blank=True, editable=False
+    )
+    image_processed = models.BooleanField(
+        'Картинка обработана', default=False, db_index=True, editable=False
+    )
+    image_claimed_at = models.DateTimeField(
+        'Картинка взята в обработку', null=True, blank=True, editable=False
+    )
     text = models.TextField('Описание')
     ingredients = models.ManyToManyField(
         Ingredient, through='RecipeProduct', verbose_name='Продукты'
@@ -151,15 +192,23 @@ class Recipe(models.Model):
     favorited_by = models.ManyToManyField(
         User,
         blank=True,
+        through='Favorite',
         related_name='favorite_recipes',
         verbose_name='Добавили в избранное'
     )
     shopped_by = models.ManyToManyField(
         User,
         blank=True,
+        through='ShoppingCartItem',
         related_name='shopping_recipes',
         verbose_name='Добавили в покупки'
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлено в избранное', default=0, editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор', null=True, editable=False
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -167,6 +216,18 @@ class Recipe(models.Model):
         default_related_name = 'recipes'
         ordering = ('-pub_date',)
 
+    search_fields = ('name', 'text')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        recipe = super().from_db(db, field_names, values)
+        recipe.indexed_values = recipe.get_search_values()
+        recipe.loaded_image = recipe.__dict__.get('image')
+        return recipe
+
+    def get_search_values(self):
+        return tuple(self.__dict__.get(field) for field in self.search_fields)
+
     def __repr__(self):
         return (
             f'<{type(self).__name__} '
@@ -221,3 +282,97 @@ class RecipeProduct(models.Model):
 
     def __str__(self):
         return f'{self.recipe}: {self.ingredient} - {self.amount}'
+
+
+class UserRecipe(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт'
+    )
+    created_at = models.DateTimeField('Дата добавления', auto_now_add=True)
+
+    class Meta:
+        abstract = True
+        ordering = ('-created_at',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_%(class)s'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'created_at'], name='%(class)s_user_created'
+            ),
+        ]
+
+    def __repr__(self):
+        return (
+            f'<{type(self).__name__} '
+            f'{self.pk=} '
+            f'{self.user=} '
+            f'{self.recipe=} '
+            f'{self.created_at=}>'
+        )
+
+
+class Favorite(UserRecipe):
+
+    class Meta(UserRecipe.Meta):
+        verbose_name = 'Избранное'
+        verbose_name_plural = 'избранное'
+        default_related_name = 'favorites'
+
+    def __str__(self):
+        return f'{self.user} добавил в избранное {self.recipe}'
+
+
+class ShoppingCartItem(UserRecipe):
+
+    class Meta(UserRecipe.Meta):
+        verbose_name = 'Рецепт в списке покупок'
+        verbose_name_plural = 'рецепты в списке покупок'
+        default_related_name = 'shopping_cart_items'
+
+    def __str__(self):
+        return f'{self.user} добавил в покупки {self.recipe}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'записи ленты'
+        default_related_name = 'timeline_entries'
+        ordering = ('-pub_date', '-recipe')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_timeline_recipe'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='timeline_user_pub_date'
+            ),
+        ]
+
+    def __repr__(self):
+        return (
+            f'<{type(self).__name__} '
+            f'{self.pk=} '
+            f'{self.user=} '
+            f'{self.recipe=} '
+            f'{self.pub_date=}>'
+        )
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
@@ -0,0 +1,103 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+BATCH_SIZE = 500
+FTS_TABLE = 'recipes_recipe_fts'
+INGREDIENT_NAMES_SQL = (
+    'COALESCE((SELECT {aggregate}(ingredient.name, \' \') '
+    'FROM recipes_recipeproduct AS product '
+    'JOIN recipes_ingredient AS ingredient '
+    'ON ingredient.id = product.ingredient_id '
+    'WHERE product.recipe_id = recipe.id), \'\')'
+)
+UPDATE_VECTOR_SQL = (
+    'UPDATE recipes_recipe AS recipe SET search_vector = '
+    'setweight(to_tsvector(%s::regconfig, recipe.name), \'A\') || '
+    'setweight(to_tsvector(%s::regconfig, {names}), \'B\') || '
+    'setweight(to_tsvector(%s::regconfig, recipe.text), \'C\') '
+    'WHERE {where}'
+).format(
+    names=INGREDIENT_NAMES_SQL.format(aggregate='string_agg'), where='{where}'
+)
+DELETE_FTS_SQL = f'DELETE FROM {FTS_TABLE} WHERE {{where}}'
+INSERT_FTS_SQL = (
+    f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+    'SELECT recipe.id, recipe.name, {names}, recipe.text '
+    'FROM recipes_recipe AS recipe WHERE {where}'
+).format(
+    names=INGREDIENT_NAMES_SQL.format(aggregate='group_concat'),
+    where='{where}'
+)
+FTS_WEIGHTS = '10.0, 5.0, 1.0'
+
+
+def write_search_index(cursor, where, params=()):
+    vendor = cursor.db.vendor
+    if vendor == 'postgresql':
+        cursor.execute(
+            UPDATE_VECTOR_SQL.format(where=where),
+            [*[settings.RECIPE_SEARCH_CONFIG] * 3, *params]
+        )
+    elif vendor == 'sqlite':
+        cursor.execute(
+            DELETE_FTS_SQL.format(where=where.replace('recipe.id', 'rowid')),
+            params
+        )
+        cursor.execute(INSERT_FTS_SQL.format(where=where), params)
+
+
+def batches(column, pks):
+    pks = list(pks)
+    for start in range(0, len(pks), BATCH_SIZE):
+        batch = pks[start:start + BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        yield f'{column} IN ({placeholders})', batch
+
+
+def update_search_index(recipe_ids=None):
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            return write_search_index(cursor, '1 = 1')
+        for where, batch in batches('recipe.id', recipe_ids):
+            write_search_index(cursor, where, batch)
+
+
+def remove_from_search_index(recipe_ids):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for where, batch in batches('rowid', recipe_ids):
+            cursor.execute(DELETE_FTS_SQL.format(where=where), batch)
+
+
+def search_recipes(recipes, query):
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        return recipes.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date')
+    if connection.vendor != 'sqlite':
+        return recipes.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+    words = re.findall(r'\w+', query)
+    if not words:
+        return recipes.none()
+    match = ' '.join(f'"{word}"*' for word in words)
+    return recipes.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)
+    )).annotate(search_rank=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, {FTS_WEIGHTS}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s '
+        f'AND rowid = {recipes.model._meta.db_table}.id',
+        (match,)
+    )).order_by('-search_rank', '-pub_date')
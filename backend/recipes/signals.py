@@ -0,0 +1,192 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import Signal, receiver
+
+from .counters import change_counter
+from .images import delete_renditions
+from .search import remove_from_search_index, update_search_index
+from .timeline import backfill_timeline, clear_timeline, fan_out_recipe
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeProduct,
+    Subscription,
+    Tag,
+    User
+)
+
+recipe_image_processed = Signal()
+catalog_imported = Signal()
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, [instance.author_id], 'recipes_count')
+
+
+@receiver(pre_delete, sender=Recipe)
+def uncount_recipe_tags(sender, instance, **kwargs):
+    change_counter(
+        Tag, list(instance.tags.values_list('pk', flat=True)),
+        'recipes_count', -1
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, **kwargs):
+    change_counter(User, [instance.author_id], 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def count_created_subscription(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, [instance.user_id], 'subscribed_to_count')
+        change_counter(User, [instance.subscribing_id], 'subscribers_count')
+
+
+@receiver(post_delete, sender=Subscription)
+def uncount_deleted_subscription(sender, instance, **kwargs):
+    change_counter(User, [instance.user_id], 'subscribed_to_count', -1)
+    change_counter(User, [instance.subscribing_id], 'subscribers_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def fill_subscriber_timeline(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_subscriber_timeline(sender, instance, **kwargs):
+    clear_timeline(instance)
+
+
+@receiver(post_save, sender=Favorite)
+def count_created_favorite(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, [instance.recipe_id], 'favorites_count')
+
+
+@receiver(post_delete, sender=Favorite)
+def uncount_deleted_favorite(sender, instance, **kwargs):
+    change_counter(Recipe, [instance.recipe_id], 'favorites_count', -1)
+
+
+def get_replaced_ingredient_id(product):
+    previous = getattr(product, 'previous_ingredient_id', None)
+    if previous != product.ingredient_id:
+        return previous
+    return None
+
+
+@receiver(pre_save, sender=RecipeProduct)
+def remember_product_ingredient(sender, instance, **kwargs):
+    instance.previous_ingredient_id = None
+    if not instance._state.adding:
+        instance.previous_ingredient_id = RecipeProduct.objects.filter(
+            pk=instance.pk
+        ).values_list('ingredient_id', flat=True).first()
+
+
+@receiver(post_save, sender=RecipeProduct)
+def count_created_product(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Ingredient, [instance.ingredient_id], 'recipes_count')
+        return
+    previous = get_replaced_ingredient_id(instance)
+    if previous is not None:
+        change_counter(Ingredient, [previous], 'recipes_count', -1)
+        change_counter(Ingredient, [instance.ingredient_id], 'recipes_count')
+
+
+@receiver(post_delete, sender=RecipeProduct)
+def uncount_deleted_product(sender, instance, **kwargs):
+    change_counter(
+        Ingredient, [instance.ingredient_id], 'recipes_count', -1
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def count_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            change_counter(
+                Tag, [instance.pk], 'recipes_count', -instance.recipes.count()
+            )
+        else:
+            uncount_recipe_tags(sender, instance)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        change_counter(
+            Tag, [instance.pk], 'recipes_count', delta * len(pk_set)
+        )
+    else:
+        change_counter(Tag, pk_set, 'recipes_count', delta)
+
+
+@receiver(pre_save, sender=Recipe)
+def reset_replaced_image(sender, instance, update_fields, **kwargs):
+    if instance._state.adding or (
+        update_fields is not None and 'image' not in update_fields
+    ):
+        return
+    if getattr(instance, 'loaded_image', None) in (None, instance.image.name):
+        return
+    renditions = instance.image_renditions
+    instance.image_renditions = {}
+    instance.image_processed = False
+    instance.image_claimed_at = None
+    instance.loaded_image = instance.image.name
+    transaction.on_commit(lambda: delete_renditions(renditions))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_renditions(sender, instance, **kwargs):
+    renditions = instance.image_renditions
+    transaction.on_commit(lambda: delete_renditions(renditions))
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and not (
+        set(instance.search_fields) & set(update_fields)
+    ):
+        return
+    values = instance.get_search_values()
+    if getattr(instance, 'indexed_values', None) != values:
+        update_search_index([instance.pk])
+        instance.indexed_values = values
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    remove_from_search_index([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        update_search_index(
+            instance.recipe_products.values_list('recipe_id', flat=True)
+        )
+
+
+@receiver(catalog_imported, sender=Ingredient)
+def reindex_imported_ingredient_recipes(sender, updated_pks, **kwargs):
+    if updated_pks:
+        update_search_index(RecipeProduct.objects.filter(
+            ingredient_id__in=updated_pks
+        ).values_list('recipe_id', flat=True).distinct())
@@ -0,0 +1,57 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import Recipe, Subscription, TimelineEntry, User
+from .timeline import trim_timelines
+
+
+class TimelineTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.follower = (
+            User.objects.create_user(
+                email=f'{username}@example.org',
+                username=username,
+                first_name='Имя',
+                last_name='Фамилия',
+                password='password-123'
+            )
+            for username in ('author', 'follower')
+        )
+        Subscription.objects.create(
+            user=cls.follower, subscribing=cls.author
+        )
+
+    def get_timeline(self):
+        return list(TimelineEntry.objects.filter(
+            user=self.follower
+        ).values_list('recipe_id', flat=True))
+
+    @override_settings(TIMELINE_SIZE=3)
+    def test_fan_out_is_insert_only_and_trim_caps(self):
+        with CaptureQueriesContext(connection) as queries:
+            recipes = [
+                Recipe.objects.create(
+                    author=self.author,
+                    name=f'Рецепт {index}',
+                    text='Описание',
+                    cooking_time=10,
+                    image='recipes/images/test.png'
+                )
+                for index in range(5)
+            ]
+        for query in queries.captured_queries:
+            self.assertNotIn(
+                f'DELETE FROM "{TimelineEntry._meta.db_table}"', query['sql']
+            )
+        self.assertEqual(
+            self.get_timeline(), [recipe.pk for recipe in reversed(recipes)]
+        )
+        self.assertEqual(trim_timelines(), 2)
+        self.assertEqual(
+            self.get_timeline(),
+            [recipe.pk for recipe in reversed(recipes[-3:])]
+        )
+        self.assertEqual(trim_timelines(), 0)
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db.models.expressions import RawSQL
+
+from .models import Recipe, Subscription, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def ranked_entries_sql(where, params):
+    return RawSQL(
+        'SELECT id FROM ('
+        'SELECT id, ROW_NUMBER() OVER ('
+        'PARTITION BY user_id ORDER BY pub_date DESC, recipe_id DESC'
+        ') AS row_number '
+        f'FROM {TimelineEntry._meta.db_table} WHERE {where}'
+        ') AS ranked WHERE row_number > %s',
+        (*params, settings.TIMELINE_SIZE)
+    )
+
+
+def trim_timelines(user_id=None):
+    if user_id is None:
+        extra = ranked_entries_sql(
+            'user_id IN ('
+            f'SELECT user_id FROM {TimelineEntry._meta.db_table} '
+            'GROUP BY user_id HAVING COUNT(*) > %s)',
+            (settings.TIMELINE_SIZE,)
+        )
+    else:
+        extra = ranked_entries_sql('user_id = %s', (user_id,))
+    return TimelineEntry.objects.filter(pk__in=extra).delete()[0]
+
+
+def fan_out_recipe(recipe):
+    followers = Subscription.objects.filter(
+        subscribing_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id, recipe=recipe, pub_date=recipe.pub_date
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_timeline(subscription):
+    recipes = Recipe.objects.filter(
+        author_id=subscription.subscribing_id
+    ).order_by('-pub_date', '-id').values_list('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=subscription.user_id,
+                recipe_id=recipe_id,
+                pub_date=pub_date
+            )
+            for recipe_id, pub_date in recipes[:settings.TIMELINE_SIZE]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    trim_timelines(subscription.user_id)
+
+
+def clear_timeline(subscription):
+    TimelineEntry.objects.filter(
+        user_id=subscription.user_id,
+        recipe__author_id=subscription.subscribing_id
+    ).delete()